@@ -21,66 +21,38 @@ import { OfacChecker } from './utils/ofacChecker';
 import { SDNList } from './components/SDNList';
 import { SDNStatus } from './types';
 import EntitySearch from './components/EntitySearch'; 
+import { submitSwiftJob, waitForSwiftJob, submitSwiftJobs, waitForSwiftJobs } from './utils/swiftJobs';
+import { subscribeToChanges, type MessageChange } from './utils/changeFeed';
 
 const STORAGE_KEY = 'swift_messages';
 const BLACKLIST_STORAGE_KEY = 'blacklist_entries';
+const BLACKLIST_API_URL = 'http://localhost:3001/api/blacklist';
+const MESSAGE_STATUSES: SwiftMessage['status'][] = ['processing', 'clear', 'flagged'];
 
 const checkAllFields = async (message: SwiftMessage): Promise<Record<string, NameCheckResult>> => {
+  const fields: [string, string | undefined][] = [
+    ['sender_name', message.sender.name],
+    ['sender_ceo', message.sender.company_details?.CEO],
+    ...(message.sender.company_details?.Founders ?? []).map(
+      (founder, index): [string, string | undefined] => [`sender_founder_${index + 1}`, founder.owner]
+    ),
+    ['receiver_name', message.receiver.name],
+    ['receiver_ceo', message.receiver.CEO],
+    ...(message.receiver.Founders ?? []).map(
+      (founder, index): [string, string | undefined] => [`receiver_founder_${index + 1}`, founder.owner]
+    ),
+    ['receiver_bank', message.receiver.bankName],
+  ];
+
+  // Checked together, so all names of the message are screened in one request to the cached endpoint
   const results: Record<string, NameCheckResult> = {};
-
-  // Check sender fields
-  if (message.sender.name) {
-    const checkResult = await OfacChecker.checkName(message.sender.name);
-    results['sender_name'] = { ...checkResult, name: message.sender.name };
-  }
-
-  // Check CEO in sender's company details
-  if (message.sender.company_details?.CEO) {
-    const checkResult = await OfacChecker.checkName(message.sender.company_details.CEO);
-    results['sender_ceo'] = { ...checkResult, name: message.sender.company_details.CEO };
-  }
-
-  // Check Founders in sender's company details
-  if (message.sender.company_details?.Founders) {
-    await Promise.all(
-      message.sender.company_details.Founders.map(async (founder, index) => {
-        if (founder.owner) {
-          const checkResult = await OfacChecker.checkName(founder.owner);
-          results[`sender_founder_${index + 1}`] = { ...checkResult, name: founder.owner };
-        }
-      })
-    );
-  }
-
-  // Check receiver fields
-  if (message.receiver.name) {
-    const checkResult = await OfacChecker.checkName(message.receiver.name);
-    results['receiver_name'] = { ...checkResult, name: message.receiver.name };
-  }
-
-  // Check CEO in receiver's company details
-  if (message.receiver.CEO) {
-    const checkResult = await OfacChecker.checkName(message.receiver.CEO);
-    results['receiver_ceo'] = { ...checkResult, name: message.receiver.CEO };
-  }
-
-  // Check Founders in receiver's company details
-  if (message.receiver.Founders) {
-    await Promise.all(
-      message.receiver.Founders.map(async (founder, index) => {
-        if (founder.owner) {
-          const checkResult = await OfacChecker.checkName(founder.owner);
-          results[`receiver_founder_${index + 1}`] = { ...checkResult, name: founder.owner };
-        }
-      })
-    );
-  }
-
-  // Check receiver bank name
-  if (message.receiver.bankName) {
-    const checkResult = await OfacChecker.checkName(message.receiver.bankName);
-    results['receiver_bank'] = { ...checkResult, name: message.receiver.bankName };
-  }
+  await Promise.all(
+    fields.map(async ([field, name]) => {
+      if (!name) return;
+      const checkResult = await OfacChecker.checkName(name);
+      results[field] = { ...checkResult, name };
+    })
+  );
 
   return results;
 };
@@ -90,9 +62,47 @@ const loadMessages = (): (SwiftMessage & { manuallyUpdated?: boolean })[] => {
   return saved ? JSON.parse(saved) : [];
 };
 
-const loadBlacklist = (): BlacklistEntry[] => {
+const loadBlacklist = async (): Promise<BlacklistEntry[]> => {
+  const response = await axios.get<BlacklistEntry[]>(BLACKLIST_API_URL);
   const saved = localStorage.getItem(BLACKLIST_STORAGE_KEY);
-  return saved ? JSON.parse(saved) : [];
+  if (!saved) return response.data;
+
+  // Migration of entries kept in this browser before the list moved to the server; runs in every
+  // browser, skips entries already uploaded and keeps the ones the server rejects for the next load
+  const serverIds = new Set(response.data.map(entry => entry.id));
+  const localEntries: BlacklistEntry[] = JSON.parse(saved).filter((entry: BlacklistEntry) => !serverIds.has(entry.id));
+  const results = await Promise.allSettled(
+    localEntries.map(entry =>
+      axios.post<BlacklistEntry>(BLACKLIST_API_URL, entry).then(
+        r => r.data,
+        error => {
+          // Uploaded meanwhile, e.g. from another tab: the server answers 409 with the stored entry
+          if (axios.isAxiosError(error) && error.response?.status === 409 && error.response.data?.entry) {
+            return error.response.data.entry as BlacklistEntry;
+          }
+          throw error;
+        }
+      )
+    )
+  );
+
+  const migrated: BlacklistEntry[] = [];
+  const failed: BlacklistEntry[] = [];
+  results.forEach((result, i) => {
+    if (result.status === 'fulfilled') {
+      migrated.push(result.value);
+    } else {
+      console.error('Blacklist entry could not be migrated:', localEntries[i], result.reason);
+      failed.push(localEntries[i]);
+    }
+  });
+
+  if (failed.length) {
+    localStorage.setItem(BLACKLIST_STORAGE_KEY, JSON.stringify(failed));
+  } else {
+    localStorage.removeItem(BLACKLIST_STORAGE_KEY);
+  }
+  return [...response.data, ...migrated];
 };
 
 export default function App() {
@@ -102,7 +112,7 @@ export default function App() {
   const [selectedMessage, setSelectedMessage] = useState<SwiftMessage | null>(null);
   const [messages, setMessages] = useState<(SwiftMessage & { manuallyUpdated?: boolean })[]>(loadMessages);
   const [filteredMessages, setFilteredMessages] = useState<SwiftMessage[]>(messages);
-  const [blacklist, setBlacklist] = useState<BlacklistEntry[]>(loadBlacklist);
+  const [blacklist, setBlacklist] = useState<BlacklistEntry[]>([]);
   const [messageChecks, setMessageChecks] = useState<Record<string, Record<string, NameCheckResult>>>({});
   const [isOfacInitialized, setIsOfacInitialized] = useState(false);
 
@@ -139,6 +149,8 @@ export default function App() {
     receiver_inn?: string | null;
     receiver_kpp: string;
     transaction_fees: string;
+    id?: number;
+    status?: string;
     company_info?: {
       CEO?: string;
       Founders?: {
@@ -167,61 +179,27 @@ export default function App() {
     };
   }
   
-  useEffect(() => {
-    const fetchParsedFiles = async () => {
-      try {
-        const response = await axios.get<Record<string, ParsedSwiftFile>>(
-          'http://localhost:3001/api/parsed-swift-files'
-        );
-        const parsedFiles = response.data;
-    
-        const loadedMessages = Object.entries(parsedFiles).map(([key, data]) => ({
-          id: key,
-          transactionRef: data.transaction_reference,
-          type: data.transaction_type,
-          date: data.transaction_date,
-          currency: data.transaction_currency,
-          amount: data.transaction_amount,
-          notes: data.transaction_purpose,
-          sender: {
-            account: data.sender_account,
-            inn: data.sender_inn || '',
-            name: data.sender_name,
-            address: data.sender_address,
-            bankCode: data.sender_bank_code,
-            sdnStatus: 'pending' as SDNStatus, // Ensure 'sdnStatus' uses SdnStatusType
-            company_details: data.company_info
-              ? {
-                  CEO: data.company_info.CEO,
-                  Founders: data.company_info.Founders?.map(founder => ({
-                    owner: founder.owner,
-                    percentage: founder.percentage ?? undefined,
-                    companyDetails: founder.companyDetails
-                      ? {
-                          CEO: founder.companyDetails.CEO,
-                          Founders: founder.companyDetails.Founders || [],
-                          inn: founder.companyDetails.inn,
-                          registrationDate: founder.companyDetails.registrationDate ?? undefined,
-                        }
-                      : undefined,
-                  })),
-                }
-              : undefined,
-          },
-          receiver: {
-            account: data.receiver_account,
-            transitAccount: data.receiver_transit_account || '',
-            bankCode: data.receiver_bank_code || '',
-            bankName: data.receiver_bank_name || '',
-            name: data.receiver_name,
-            inn: data.receiver_inn || '',
-            kpp: data.receiver_kpp,
-            sdnStatus: 'pending' as SDNStatus,
-            CEO: data.receiver_info?.CEO || '',
-            Founders: data.receiver_info?.Founders?.map(founder => ({
+  const toSwiftMessage = (key: string, data: ParsedSwiftFile) => ({
+    id: data.id != null ? String(data.id) : key,
+    transactionRef: data.transaction_reference,
+    type: data.transaction_type,
+    date: data.transaction_date,
+    currency: data.transaction_currency,
+    amount: data.transaction_amount,
+    notes: data.transaction_purpose,
+    sender: {
+      account: data.sender_account,
+      inn: data.sender_inn || '',
+      name: data.sender_name,
+      address: data.sender_address,
+      bankCode: data.sender_bank_code,
+      sdnStatus: 'pending' as SDNStatus, // Ensure 'sdnStatus' uses SdnStatusType
+      company_details: data.company_info
+        ? {
+            CEO: data.company_info.CEO,
+            Founders: data.company_info.Founders?.map(founder => ({
               owner: founder.owner,
               percentage: founder.percentage ?? undefined,
-              isCompany: founder.isCompany,
               companyDetails: founder.companyDetails
                 ? {
                     CEO: founder.companyDetails.CEO,
@@ -230,22 +208,89 @@ export default function App() {
                     registrationDate: founder.companyDetails.registrationDate ?? undefined,
                   }
                 : undefined,
-            })) || [],
-          },
-          purpose: data.transaction_purpose,
-          fees: data.transaction_fees,
-          status: 'processing' as SwiftMessage['status'],
-          manuallyUpdated: false,
-        }));
+            })),
+          }
+        : undefined,
+    },
+    receiver: {
+      account: data.receiver_account,
+      transitAccount: data.receiver_transit_account || '',
+      bankCode: data.receiver_bank_code || '',
+      bankName: data.receiver_bank_name || '',
+      name: data.receiver_name,
+      inn: data.receiver_inn || '',
+      kpp: data.receiver_kpp,
+      sdnStatus: 'pending' as SDNStatus,
+      CEO: data.receiver_info?.CEO || '',
+      Founders: data.receiver_info?.Founders?.map(founder => ({
+        owner: founder.owner,
+        percentage: founder.percentage ?? undefined,
+        isCompany: founder.isCompany,
+        companyDetails: founder.companyDetails
+          ? {
+              CEO: founder.companyDetails.CEO,
+              Founders: founder.companyDetails.Founders || [],
+              inn: founder.companyDetails.inn,
+              registrationDate: founder.companyDetails.registrationDate ?? undefined,
+            }
+          : undefined,
+      })) || [],
+    },
+    purpose: data.transaction_purpose,
+    fees: data.transaction_fees,
+    status: (MESSAGE_STATUSES.includes(data.status as SwiftMessage['status'])
+      ? data.status
+      : 'processing') as SwiftMessage['status'],
+    manuallyUpdated: false,
+  });
+
+  useEffect(() => {
+    let unsubscribe: (() => void) | undefined;
+
+    const fetchParsedFiles = async () => {
+      try {
+        const response = await axios.get<Record<string, ParsedSwiftFile>>(
+          'http://localhost:3001/api/parsed-swift-files'
+        );
+        const parsedFiles = response.data;
+    
+        const loadedMessages = Object.entries(parsedFiles).map(([key, data]) => toSwiftMessage(key, data));
     
         setMessages(loadedMessages);
         setFilteredMessages(loadedMessages);
+
+        const archived = response.headers['x-archived-partitions'];
+        if (archived) {
+          console.warn(`Messages of archived months are not listed: ${archived}`);
+        }
+
+        // Follow inserts, status updates and deletes from the snapshot position instead of refetching
+        const since = Number(response.headers['x-change-seq'] || 0);
+        unsubscribe = subscribeToChanges<ParsedSwiftFile>(since, applyMessageChange, () => {
+          unsubscribe?.();
+          fetchParsedFiles();
+        });
       } catch (error) {
         console.error('Error fetching parsed SWIFT files:', error);
       }
     };
-  
+
+    const applyMessageChange = (change: MessageChange<ParsedSwiftFile>) => {
+      const id = String(change.id);
+      if (change.operation === 'delete' || !change.message) {
+        setMessages(prev => prev.filter(msg => msg.id !== id));
+        return;
+      }
+      const changed = toSwiftMessage(id, change.message);
+      setMessages(prev =>
+        prev.some(msg => msg.id === id)
+          ? prev.map(msg => (msg.id === id ? { ...msg, ...changed, notes: msg.notes } : msg))
+          : [...prev, changed]
+      );
+    };
+
     fetchParsedFiles();
+    return () => unsubscribe?.();
   }, []);  
 
   useEffect(() => {
@@ -254,8 +299,10 @@ export default function App() {
   }, [messages]);
 
   useEffect(() => {
-    localStorage.setItem(BLACKLIST_STORAGE_KEY, JSON.stringify(blacklist));
-  }, [blacklist]);
+    loadBlacklist()
+      .then(setBlacklist)
+      .catch(error => console.error('Error loading blacklist:', error));
+  }, []);
 
   const handleFilterChange = (filters: any) => {
     const filtered = messages.filter(message => {
@@ -330,57 +377,34 @@ export default function App() {
     }));
   };
 
+  // The change feed delivers the same insert, so both upsert by the stored id and whichever
+  // arrives second only merges; the upload comments replace the notes either way
+  const addUploadedMessage = async (data: ParsedSwiftFile, comments: string) => {
+    if (data.id == null) {
+      return; // Reference was already stored, and that message is listed already
+    }
+    const uploaded = { ...toSwiftMessage(String(data.id), data), notes: comments };
+
+    if (isOfacInitialized) {
+      const checks = await checkAllFields(uploaded);
+      setMessageChecks(prev => ({
+        ...prev,
+        [uploaded.id]: checks
+      }));
+    }
+
+    setMessages(prev =>
+      prev.some(msg => msg.id === uploaded.id)
+        ? prev.map(msg => (msg.id === uploaded.id ? { ...msg, notes: comments } : msg))
+        : [...prev, uploaded]
+    );
+  };
+
   const handleUpload = async (messageText: string, comments: string) => {
     try {
-      const response = await axios.post('http://localhost:3001/api/process-swift', {
-        message: messageText,
-      });
-
-      const { data } = response;
-      const newMessage: SwiftMessage & { manuallyUpdated?: boolean } = {
-        id: crypto.randomUUID(),
-        transactionRef: data.transaction_reference || '',
-        type: data.transaction_type || '',
-        date: data.transaction_date || '',
-        currency: data.transaction_currency || '',
-        amount: data.transaction_amount || '',
-        notes: comments,
-        sender: {
-          account: data.sender_account || '',
-          inn: data.sender_inn || '',
-          name: data.sender_name || '',
-          address: data.sender_address || '',
-          bankCode: data.sender_bank_code || '',
-          sdnStatus: 'pending',
-          company_details: data.company_info || {},
-        },
-        receiver: {
-          account: data.receiver_account || '',
-          transitAccount: data.receiver_transit_account || '',
-          bankCode: data.receiver_bank_code || '',
-          bankName: data.receiver_bank_name || '',
-          name: data.receiver_name || '',
-          inn: data.receiver_inn || '',
-          kpp: data.receiver_kpp || '',
-          sdnStatus: 'pending',
-          CEO: data.receiver_info?.CEO || '',
-          Founders: data.receiver_info?.Founders || [],
-        },
-        purpose: data.transaction_purpose || '',
-        fees: data.transaction_fees || '',
-        status: 'processing',
-        manuallyUpdated: false
-      };
-
-      if (isOfacInitialized) {
-        const checks = await checkAllFields(newMessage);
-        setMessageChecks(prev => ({
-          ...prev,
-          [newMessage.id]: checks
-        }));
-      }
-
-      setMessages(prev => [...prev, newMessage]);
+      const jobId = await submitSwiftJob(messageText);
+      const data = await waitForSwiftJob(jobId);
+      await addUploadedMessage(data, comments);
       setIsUploadModalOpen(false);
     } catch (error) {
       console.error('Error processing SWIFT message:', error);
@@ -388,27 +412,61 @@ export default function App() {
     }
   };
 
-  const handleAddBlacklistEntry = (entry: Omit<BlacklistEntry, 'id' | 'dateAdded'>) => {
-    const newEntry: BlacklistEntry = {
-      ...entry,
-      id: crypto.randomUUID(),
-      dateAdded: new Date().toISOString(),
-    };
-    setBlacklist(prev => [...prev, newEntry]);
+  // Files are submitted in one request and followed through one stream, however many there are
+  const handleUploadFiles = async (
+    uploads: { messageText: string; comments: string }[],
+    onProgress: (finished: number) => void
+  ) => {
+    const submitted = await submitSwiftJobs(uploads.map(upload => upload.messageText));
+    const comments = new Map<string, string>();
+    const errors: string[] = [];
+    submitted.forEach((job, i) => {
+      if (job.job_id) comments.set(job.job_id, uploads[i].comments);
+      else errors.push(`${uploads[i].comments}: ${job.error}`);
+    });
+
+    let finished = errors.length;
+    onProgress(finished);
+    await waitForSwiftJobs(Array.from(comments.keys()), async (outcome) => {
+      if (outcome.error) {
+        errors.push(`${comments.get(outcome.jobId)}: ${outcome.error}`);
+      } else {
+        await addUploadedMessage(outcome.result, comments.get(outcome.jobId) || '');
+      }
+      onProgress(++finished);
+    });
+
+    if (errors.length) {
+      throw new Error(`${errors.length} of ${uploads.length} files failed: ${errors.join('; ')}`);
+    }
+    setIsUploadModalOpen(false);
   };
 
-  const handleUpdateBlacklistEntry = (id: string, entry: Omit<BlacklistEntry, 'id' | 'dateAdded'>) => {
-    setBlacklist(prev =>
-      prev.map(item =>
-        item.id === id
-          ? { ...entry, id, dateAdded: item.dateAdded }
-          : item
-      )
-    );
+  const handleAddBlacklistEntry = async (entry: Omit<BlacklistEntry, 'id' | 'dateAdded'>) => {
+    try {
+      const { data: newEntry } = await axios.post<BlacklistEntry>(BLACKLIST_API_URL, entry);
+      setBlacklist(prev => [...prev, newEntry]);
+    } catch (error) {
+      console.error('Error adding blacklist entry:', error);
+    }
   };
 
-  const handleDeleteBlacklistEntry = (id: string) => {
-    setBlacklist(prev => prev.filter(entry => entry.id !== id));
+  const handleUpdateBlacklistEntry = async (id: string, entry: Omit<BlacklistEntry, 'id' | 'dateAdded'>) => {
+    try {
+      const { data: updatedEntry } = await axios.put<BlacklistEntry>(`${BLACKLIST_API_URL}/${id}`, entry);
+      setBlacklist(prev => prev.map(item => (item.id === id ? updatedEntry : item)));
+    } catch (error) {
+      console.error('Error updating blacklist entry:', error);
+    }
+  };
+
+  const handleDeleteBlacklistEntry = async (id: string) => {
+    try {
+      await axios.delete(`${BLACKLIST_API_URL}/${id}`);
+      setBlacklist(prev => prev.filter(entry => entry.id !== id));
+    } catch (error) {
+      console.error('Error deleting blacklist entry:', error);
+    }
   };
 
   const handleDeleteMessage = async (id: string) => {
@@ -509,6 +567,7 @@ const handleStatusChange = async (id: string, status: SwiftMessage['status']) =>
               isOpen={isUploadModalOpen}
               onClose={() => setIsUploadModalOpen(false)}
               onUpload={handleUpload}
+              onUploadFiles={handleUploadFiles}
             />
 
             {selectedMessage && (
@@ -518,7 +577,6 @@ const handleStatusChange = async (id: string, status: SwiftMessage['status']) =>
                 onClose={() => setSelectedMessage(null)}
                 onStatusChange={handleStatusChange}
                 onNotesChange={handleNotesChange}
-                blacklist={blacklist}
                 savedChecks={messageChecks[selectedMessage.id]}
                 onStoreChecks={(checks) => handleStoreChecks(selectedMessage.id, checks)}
               />
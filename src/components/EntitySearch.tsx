@@ -34,7 +34,7 @@ const EntitySearch: React.FC = () => {
     const checkEntity = async (name: string) => {
       const transliteratedName = transliterate(name);
       const ofacResult = await OfacChecker.checkName(transliteratedName);
-      const blacklistResult = BlacklistChecker.checkName(transliteratedName, []);
+      const blacklistResult = await BlacklistChecker.checkName(transliteratedName);
 
       results[transliteratedName] = {
         ofacMatch: ofacResult.isMatch,
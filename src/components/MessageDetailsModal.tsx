@@ -12,10 +12,9 @@ import {
   Shield, 
   RefreshCw
 } from 'lucide-react';
-import type { SwiftMessage, BlacklistEntry, NameCheckResult, Owner } from '../types';
+import type { SwiftMessage, BlacklistMatch, NameCheckResult, Owner } from '../types';
 import { OfacChecker } from '../utils/ofacChecker';
 import { BlacklistChecker } from '../utils/blacklistChecker';
-import { transliterate as transliterateText } from 'transliteration';
 
 interface MessageDetailsModalProps {
   message: SwiftMessage;
@@ -25,7 +24,6 @@ interface MessageDetailsModalProps {
   onNotesChange?: (id: string, notes: string) => void;
   savedChecks?: Record<string, NameCheckResult>;
   onStoreChecks?: (checks: Record<string, NameCheckResult>) => void;
-  blacklist?: BlacklistEntry[];
 }
 
 interface OwnershipNodeState {
@@ -40,13 +38,13 @@ export function MessageDetailsModal({
   onNotesChange,
   savedChecks,
   onStoreChecks,
-  blacklist,
 }: MessageDetailsModalProps) {
   const modalRef = useRef<HTMLDivElement>(null);
   const [expandedNodes, setExpandedNodes] = useState<OwnershipNodeState>({});
   const [notes, setNotes] = useState(message.notes || '');
   const [currentStatus, setStatus] = useState<SwiftMessage['status']>(message.status);
   const [nameChecks, setNameChecks] = useState<Record<string, NameCheckResult>>({});
+  const [blacklistChecks, setBlacklistChecks] = useState<Record<string, BlacklistMatch | null>>({});
   const [isChecking, setIsChecking] = useState(false);
   const [isManualOverride, setIsManualOverride] = useState(message.manuallyUpdated || false);
   const [hasChecked, setHasChecked] = useState(false);
@@ -57,22 +55,10 @@ export function MessageDetailsModal({
         try {
           setIsChecking(true);
           await OfacChecker.initialize();
-  
-          const results: Record<string, NameCheckResult> = {};
-          const namesToCheck = new Set<string>();
-  
-          collectNames(message.sender, namesToCheck);
-          collectNames(message.sender.company_details, namesToCheck);
-          collectNames(message.receiver, namesToCheck);
-  
-          for (const name of namesToCheck) {
-            const checkResult = await OfacChecker.checkName(name) as NameCheckResult;
-            results[name] = { ...checkResult, name };
-          }
-  
-          setNameChecks(results);
+
+          const { results, blacklistResults } = await screenNames();
           if (!isManualOverride) {
-            const newStatus = determineStatus();
+            const newStatus = determineStatus(results, blacklistResults);
             setStatus(newStatus);
             onStatusChange?.(message.id, newStatus);
           }
@@ -130,7 +116,7 @@ export function MessageDetailsModal({
     if (!name) return null;
 
     const ofacCheck = nameChecks[name];
-    const blacklistMatch = blacklist ? BlacklistChecker.checkName(name, blacklist) : null;
+    const blacklistMatch = blacklistChecks[name];
 
     return (
       <div className="flex items-center space-x-1">
@@ -198,12 +184,12 @@ export function MessageDetailsModal({
     );
   };
 
-  const determineStatus = () => {
-    // Check if there is a blacklist match
-    const hasBlacklistMatch = blacklist?.some(entry => {
-        const blacklistMatch = BlacklistChecker.checkName(entry.names.fullNameEn, blacklist);
-        return blacklistMatch && blacklistMatch.isMatch;
-    });
+  const determineStatus = (
+    checks: Record<string, NameCheckResult>,
+    blacklistResults: Record<string, BlacklistMatch | null>
+  ) => {
+    // Check if any of the screened names is blacklisted
+    const hasBlacklistMatch = Object.values(blacklistResults).some(match => match?.isMatch);
 
     // If a blacklist match is found, set status to 'flagged'
     if (hasBlacklistMatch) {
@@ -214,7 +200,7 @@ export function MessageDetailsModal({
     let hasRedMatch = false;
     let hasYellowMatch = false;
 
-    Object.values(nameChecks).forEach((check) => {
+    Object.values(checks).forEach((check) => {
         if (check.matchScore === 1) {
             hasRedMatch = true; // 100% match, considered high-risk
         } else if (check.isMatch) {
@@ -322,9 +308,9 @@ export function MessageDetailsModal({
   };
 
   const collectNames = (entity: any, namesToCheck: Set<string>) => {
+    // Names are sent as written: the server folds Cyrillic and Latin spellings to the same keys
     if (entity.name) {
-      const latinName = transliterateText(entity.name);
-      namesToCheck.add(latinName);
+      namesToCheck.add(entity.name);
     }
     if (entity.CEO) {
       namesToCheck.add(entity.CEO);
@@ -342,24 +328,36 @@ export function MessageDetailsModal({
     }
   };
 
+  // OFAC and blacklist results for every name of the message, both screened on the server
+  const screenNames = async () => {
+    const namesToCheck = new Set<string>();
+    collectNames(message.sender, namesToCheck);
+    collectNames(message.sender.company_details, namesToCheck);
+    collectNames(message.receiver, namesToCheck);
+
+    const results: Record<string, NameCheckResult> = {};
+    const blacklistResults: Record<string, BlacklistMatch | null> = {};
+    // Started together, so every name of the message goes to the server in one request
+    await Promise.all([...namesToCheck].map(async name => {
+      const [checkResult, blacklistMatch] = await Promise.all([
+        OfacChecker.checkName(name),
+        BlacklistChecker.checkName(name),
+      ]);
+      results[name] = { ...checkResult, name } as NameCheckResult;
+      blacklistResults[name] = blacklistMatch;
+    }));
+
+    setNameChecks(results);
+    setBlacklistChecks(blacklistResults);
+    return { results, blacklistResults };
+  };
+
   const recheck = async () => {
     try {
       setIsChecking(true);
       await OfacChecker.initialize();
 
-      const results: Record<string, NameCheckResult> = {};
-      const namesToCheck = new Set<string>();
-
-      collectNames(message.sender, namesToCheck);
-      collectNames(message.sender.company_details, namesToCheck);
-      collectNames(message.receiver, namesToCheck);
-
-      for (const name of namesToCheck) {
-        const checkResult = await OfacChecker.checkName(name) as NameCheckResult; // Cast result as NameCheckResult
-        results[name] = { ...checkResult, name }; // Now it matches NameCheckResult
-      }
-
-      setNameChecks(results);
+      const { results } = await screenNames();
       message.nameChecks = results;
       message.matchScore = calculateMatchScore(results);
       setHasChecked(true);
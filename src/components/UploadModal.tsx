@@ -5,9 +5,13 @@ interface UploadModalProps {
   isOpen: boolean;
   onClose: () => void;
   onUpload: (messageText: string, comments: string) => Promise<void>;
+  onUploadFiles: (
+    uploads: { messageText: string; comments: string }[],
+    onProgress: (finished: number) => void
+  ) => Promise<void>;
 }
 
-export function UploadModal({ isOpen, onClose, onUpload }: UploadModalProps) {
+export function UploadModal({ isOpen, onClose, onUpload, onUploadFiles }: UploadModalProps) {
   const [messageText, setMessageText] = useState('');
   const [comments, setComments] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -61,12 +65,13 @@ export function UploadModal({ isOpen, onClose, onUpload }: UploadModalProps) {
     setError(null);
 
     try {
-      for (let i = 0; i < files.length; i++) {
-        setCurrentFileIndex(i + 1);
-        const file = files[i];
-        const text = await processFile(file);
-        await onUpload(text, `Uploaded from file: ${file.name}`);
-      }
+      // Validate everything first, then submit the batch in one request; enrichment runs as server-side jobs
+      const fileList = Array.from(files);
+      const texts = await Promise.all(fileList.map(processFile));
+      await onUploadFiles(
+        texts.map((text, i) => ({ messageText: text, comments: `Uploaded from file: ${fileList[i].name}` })),
+        setCurrentFileIndex
+      );
       onClose();
     } catch (error) {
       setError(error instanceof Error ? error.message : 'Failed to process files');
@@ -0,0 +1,344 @@
+import sqlite3
+import json
+import re
+import uuid
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+
+try:
+    from .nameKeys import compute_name_keys, phonetic_join_key, bigram_similarity, NAME_KEY_VERSION
+    from .partitionStore import ensure_column
+except ImportError:
+    from nameKeys import compute_name_keys, phonetic_join_key, bigram_similarity, NAME_KEY_VERSION
+    from partitionStore import ensure_column
+
+blacklist_api = Blueprint('blacklist_api', __name__)
+
+DATABASE_PATH = 'swift_messages.db'
+SIMILARITY_THRESHOLD = 0.8  # Same threshold as the client-side BlacklistChecker
+
+# Name fields of a blacklist entry with their match type and language
+NAME_VARIANTS = {
+    "fullNameEn": ("full", "en"),
+    "fullNameRu": ("full", "ru"),
+    "shortNameEn": ("short", "en"),
+    "shortNameRu": ("short", "ru"),
+    "abbreviationEn": ("abbreviation", "en"),
+    "abbreviationRu": ("abbreviation", "ru"),
+}
+
+
+class BlacklistEntryExists(Exception):
+    """Raised when a new entry carries the id of an entry already stored."""
+
+
+def initialize_blacklist_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blacklist_entries (
+        id TEXT PRIMARY KEY,
+        inn TEXT,
+        names TEXT,
+        notes TEXT,
+        date_added TEXT
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_entries_inn ON blacklist_entries (inn)')
+
+    # One row per non-empty name variant, with its normalized form and bigram count
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blacklist_names (
+        variant_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        entry_id TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        normalized TEXT NOT NULL,
+        gram_count INTEGER NOT NULL,
+        match_key TEXT,
+        phonetic_key TEXT
+    )
+    ''')
+    ensure_column(cursor, 'blacklist_names', 'match_key', 'TEXT')
+    ensure_column(cursor, 'blacklist_names', 'phonetic_key', 'TEXT')
+    ensure_column(cursor, 'blacklist_names', 'key_version', 'INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_names_entry ON blacklist_names (entry_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_names_normalized ON blacklist_names (normalized)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_names_match_key ON blacklist_names (match_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_names_phonetic_key ON blacklist_names (phonetic_key)')
+
+    # Inverted bigram index over all name variants
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blacklist_ngrams (
+        gram TEXT NOT NULL,
+        variant_id INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_ngrams_gram ON blacklist_ngrams (gram)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_ngrams_variant ON blacklist_ngrams (variant_id)')
+
+    # Single-row counter bumped with every change to the entries; keys the screening cache
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blacklist_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO blacklist_version (id, version) VALUES (1, 1)")
+
+    # Reindex entries whose variants predate the current cross-script match keys
+    cursor.execute("SELECT DISTINCT entry_id FROM blacklist_names WHERE key_version IS NULL OR key_version != ?", (NAME_KEY_VERSION,))
+    stale_entries = cursor.fetchall()
+    for (entry_id,) in stale_entries:
+        cursor.execute("SELECT names FROM blacklist_entries WHERE id = ?", (entry_id,))
+        row = cursor.fetchone()
+        _index_names(cursor, entry_id, json.loads(row[0]) if row and row[0] else {})
+    if stale_entries:
+        _bump_version(cursor)
+
+
+def normalize_text(text):
+    """Mirror of BlacklistChecker.normalizeText in the frontend."""
+    text = re.sub(r"['\".,/#!$%^&*;:{}=\-_`~()]", '', text.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def get_bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _bump_version(cursor):
+    cursor.execute("UPDATE blacklist_version SET version = version + 1 WHERE id = 1")
+
+
+def get_blacklist_version(conn):
+    row = conn.execute("SELECT version FROM blacklist_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def _row_to_entry(row):
+    return {
+        "id": row["id"],
+        "inn": row["inn"] or "",
+        "names": json.loads(row["names"]) if row["names"] else {},
+        "notes": row["notes"] or "",
+        "dateAdded": row["date_added"],
+    }
+
+
+def _index_names(cursor, entry_id, names):
+    cursor.execute(
+        "DELETE FROM blacklist_ngrams WHERE variant_id IN (SELECT variant_id FROM blacklist_names WHERE entry_id = ?)",
+        (entry_id,)
+    )
+    cursor.execute("DELETE FROM blacklist_names WHERE entry_id = ?", (entry_id,))
+
+    for name_key in NAME_VARIANTS:
+        value = (names.get(name_key) or "").strip()
+        normalized = normalize_text(value)
+        if not normalized:
+            continue
+        grams = get_bigrams(normalized)
+        keys = compute_name_keys(value)
+        cursor.execute(
+            "INSERT INTO blacklist_names (entry_id, name_key, value, normalized, gram_count, match_key, phonetic_key, key_version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry_id, name_key, value, normalized, len(grams), keys["name_key"], keys["phonetic_key"], NAME_KEY_VERSION)
+        )
+        variant_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO blacklist_ngrams (gram, variant_id) VALUES (?, ?)",
+            [(gram, variant_id) for gram in grams]
+        )
+
+
+def list_entries():
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("SELECT * FROM blacklist_entries ORDER BY date_added").fetchall()
+        return [_row_to_entry(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def get_entry(entry_id, conn):
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM blacklist_entries WHERE id = ?", (entry_id,)).fetchone()
+    return _row_to_entry(row) if row else None
+
+
+def save_entry(entry, entry_id=None):
+    """Insert a new entry, or replace the one with entry_id, and rebuild its name index.
+
+    A new entry may bring its own id (entries migrated from a browser do); if
+    that id is taken, BlacklistEntryExists is raised and nothing is changed.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    names = {key: entry.get("names", {}).get(key, "") for key in NAME_VARIANTS}
+
+    try:
+        if entry_id is None:
+            entry_id = entry.get("id") or str(uuid.uuid4())
+            try:
+                cursor.execute(
+                    "INSERT INTO blacklist_entries (id, inn, names, notes, date_added) VALUES (?, ?, ?, ?, ?)",
+                    (entry_id, entry.get("inn") or None, json.dumps(names, ensure_ascii=False), entry.get("notes", ""),
+                     entry.get("dateAdded") or datetime.now().isoformat())
+                )
+            except sqlite3.IntegrityError:
+                raise BlacklistEntryExists(entry_id)
+        else:
+            cursor.execute(
+                "UPDATE blacklist_entries SET inn = ?, names = ?, notes = ? WHERE id = ?",
+                (entry.get("inn") or None, json.dumps(names, ensure_ascii=False), entry.get("notes", ""), entry_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+        _index_names(cursor, entry_id, names)
+        _bump_version(cursor)
+        conn.commit()
+        return get_entry(entry_id, conn)
+    finally:
+        conn.close()
+
+
+def delete_entry(entry_id):
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM blacklist_entries WHERE id = ?", (entry_id,))
+        deleted = cursor.rowcount > 0
+        _index_names(cursor, entry_id, {})
+        if deleted:
+            _bump_version(cursor)
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+
+def check_inn(inn, conn):
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM blacklist_entries WHERE inn = ? LIMIT 1", (inn,)).fetchone()
+    if row is None:
+        return None
+    return {"isMatch": True, "matchedName": inn, "matchType": "inn", "language": "numeric",
+            "score": 1.0, "entry": _row_to_entry(row)}
+
+
+def match_name(name, conn, threshold=SIMILARITY_THRESHOLD):
+    """Best blacklist match for a name, or None.
+
+    Exact normalized-name and cross-script key matches are answered from their
+    indexes, phonetic-key candidates are confirmed by bigram similarity, and
+    fuzzy matches only score the variants that share at least one bigram with
+    the name.
+    """
+    conn.row_factory = sqlite3.Row
+    normalized = normalize_text(name or "")
+    if not normalized:
+        return None
+
+    keys = compute_name_keys(name)
+    best = None
+    for column, value in (("normalized", normalized), ("match_key", keys["name_key"])):
+        if not value:
+            continue
+        best = conn.execute(
+            f"SELECT entry_id, name_key, value, 1.0 AS score FROM blacklist_names WHERE {column} = ? LIMIT 1",
+            (value,)
+        ).fetchone()
+        if best is not None:
+            break
+
+    # A phonetic join only proposes candidates; each must still reach the threshold on its folded key
+    phonetic_key = phonetic_join_key(keys)
+    if best is None and phonetic_key:
+        best_score = 0
+        for candidate in conn.execute(
+            "SELECT entry_id, name_key, value, match_key FROM blacklist_names WHERE phonetic_key = ?", (phonetic_key,)
+        ):
+            score = bigram_similarity(keys["name_key"], candidate["match_key"] or "")
+            if score >= threshold and score > best_score:
+                best_score = score
+                best = {**dict(candidate), "score": score}
+
+    grams = get_bigrams(normalized)
+    if best is None and grams:
+        placeholders = ",".join("?" * len(grams))
+        candidates = conn.execute(f'''
+            SELECT v.entry_id, v.name_key, v.value, v.gram_count, COUNT(*) AS shared
+            FROM blacklist_ngrams g JOIN blacklist_names v ON v.variant_id = g.variant_id
+            WHERE g.gram IN ({placeholders})
+            GROUP BY g.variant_id
+        ''', tuple(grams)).fetchall()
+
+        best_score = 0
+        for candidate in candidates:
+            score = 2.0 * candidate["shared"] / (len(grams) + candidate["gram_count"])
+            if score >= threshold and score > best_score:
+                best_score = score
+                best = {**dict(candidate), "score": score}
+
+    if best is None:
+        return None
+
+    match_type, language = NAME_VARIANTS[best["name_key"]]
+    return {"isMatch": True, "matchedName": best["value"], "matchType": match_type, "language": language,
+            "score": best["score"], "entry": get_entry(best["entry_id"], conn)}
+
+
+def check_name(name, inn=None, threshold=SIMILARITY_THRESHOLD, conn=None):
+    """Screen a name (and optionally an INN) against the blacklist; an INN match takes precedence."""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DATABASE_PATH)
+
+    try:
+        return (check_inn(inn, conn) if inn else None) or match_name(name, conn, threshold)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+@blacklist_api.route('/api/blacklist', methods=['GET'])
+def api_list_blacklist():
+    return jsonify(list_entries())
+
+
+@blacklist_api.route('/api/blacklist', methods=['POST'])
+def api_add_blacklist_entry():
+    entry = request.json or {}
+    if not entry.get("inn") and not any((entry.get("names") or {}).values()):
+        return jsonify({"error": "An entry needs an INN or at least one name"}), 400
+    try:
+        return jsonify(save_entry(entry)), 201
+    except BlacklistEntryExists as e:
+        # The stored entry comes along, so a client retrying an upload can take it as done
+        conn = sqlite3.connect(DATABASE_PATH)
+        try:
+            existing = get_entry(str(e), conn)
+        finally:
+            conn.close()
+        return jsonify({"error": f"A blacklist entry with ID {e} already exists; update it with PUT", "entry": existing}), 409
+
+
+@blacklist_api.route('/api/blacklist/<string:entry_id>', methods=['PUT'])
+def api_update_blacklist_entry(entry_id):
+    updated = save_entry(request.json or {}, entry_id)
+    if updated is None:
+        return jsonify({"error": "No blacklist entry found with the given ID"}), 404
+    return jsonify(updated)
+
+
+@blacklist_api.route('/api/blacklist/<string:entry_id>', methods=['DELETE'])
+def api_delete_blacklist_entry(entry_id):
+    if delete_entry(entry_id):
+        return jsonify({"message": f"Blacklist entry {entry_id} deleted successfully"}), 200
+    return jsonify({"error": "No blacklist entry found with the given ID"}), 404
+
+
+@blacklist_api.route('/api/blacklist/check', methods=['GET'])
+def api_check_blacklist():
+    match = check_name(request.args.get("name"), request.args.get("inn"))
+    return jsonify(match or {"isMatch": False})
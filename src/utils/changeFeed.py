@@ -0,0 +1,137 @@
+import json
+import threading
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+
+try:
+    from .messageStore import get_message_store, StorageError
+except ImportError:
+    from messageStore import get_message_store, StorageError
+
+change_feed_api = Blueprint('change_feed_api', __name__)
+
+CHANGE_PAGE_SIZE = 500
+CHANGE_PUBLISH_SECONDS = 1  # Upper bound on latency for changes committed by other processes
+HEARTBEAT_SECONDS = 15
+
+
+class ChangeNotifier:
+    """Wakes change feed streams when the publisher has seen the feed grow."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, seen_version, timeout):
+        """Block until a change newer than seen_version or the timeout; returns the current version."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != seen_version, timeout=timeout)
+            return self.version
+
+
+change_notifier = ChangeNotifier()
+# Set by commits of this process, so the publisher runs before its interval is up
+publish_wakeup = threading.Event()
+publisher_thread = None
+
+
+def publish_changes(store):
+    """The one publisher of a process: numbers finished changes and wakes the streams when the feed grew.
+
+    Streams only read, so the publishing writes and the polling for commits of
+    other processes cost the same however many streams are open.
+    """
+    latest = None
+    while True:
+        publish_wakeup.wait(CHANGE_PUBLISH_SECONDS)
+        publish_wakeup.clear()
+        try:
+            store.publish_changes()
+            current = store.change_bounds()[1]
+        except StorageError as e:
+            print(f"Change feed publisher: {e}")
+            continue
+        if current != latest:
+            latest = current
+            change_notifier.notify()
+
+
+def attach_change_notifier(store):
+    global publisher_thread
+    store.add_change_listener(publish_wakeup.set)
+    if publisher_thread is None:
+        publisher_thread = threading.Thread(target=publish_changes, args=(store,), name="change-feed-publisher", daemon=True)
+        publisher_thread.start()
+
+
+def read_changes(since, limit=CHANGE_PAGE_SIZE):
+    """Changes after since; reset is set when since predates the retained feed and a full reload is needed."""
+    store = get_message_store()
+    oldest, latest = store.change_bounds()
+    reset = oldest is not None and since < oldest - 1
+    changes = store.changes_since(since, limit)
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else max(since, latest or 0),
+        "reset": reset,
+    }
+
+
+def _since_param():
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if since is None:
+        return None
+    try:
+        return int(since)
+    except ValueError:
+        raise ValueError(f"Invalid change sequence: {since}")
+
+
+@change_feed_api.route('/api/changes', methods=['GET'])
+def api_changes():
+    try:
+        since = _since_param() or 0
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = min(request.args.get("limit", CHANGE_PAGE_SIZE, type=int), CHANGE_PAGE_SIZE)
+    return jsonify(read_changes(since, limit))
+
+
+@change_feed_api.route('/api/changes/stream', methods=['GET'])
+def api_change_stream():
+    """SSE stream of change entries; without since it starts at the latest change."""
+    try:
+        since = _since_param()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if since is None:
+        since = get_message_store().change_bounds()[1] or 0
+
+    def stream():
+        last_seq = since
+        seen_version = change_notifier.version
+        while True:
+            page = read_changes(last_seq)
+            if page["reset"]:
+                yield f"event: reset\ndata: {json.dumps({'last_seq': page['last_seq']})}\n\n"
+            for change in page["changes"]:
+                yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change, ensure_ascii=False)}\n\n"
+            last_seq = page["last_seq"]
+            if len(page["changes"]) == CHANGE_PAGE_SIZE:
+                continue
+
+            # Read again only once the publisher has seen new changes
+            version = change_notifier.wait(seen_version, HEARTBEAT_SECONDS)
+            if version == seen_version:
+                yield ": heartbeat\n\n"
+            seen_version = version
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,72 @@
+import axios from 'axios';
+
+const CHANGES_URL = 'http://localhost:3001/api/changes';
+const POLL_INTERVAL_MS = 5000;
+
+export interface MessageChange<T = any> {
+  seq: number;
+  operation: 'insert' | 'update' | 'delete';
+  id: number;
+  transaction_reference: string | null;
+  changed_at: string;
+  message: T | null;
+}
+
+/**
+ * Follow the message change feed from a known position, using Server-Sent Events
+ * and falling back to polling /api/changes.
+ * @param since Sequence the caller is up to date with (X-Change-Seq of its snapshot).
+ * @param onChange Called once per change, in sequence order.
+ * @param onReset Called when the feed no longer reaches back to `since` and a full reload is needed.
+ * @returns A function that stops following the feed.
+ */
+export const subscribeToChanges = <T = any>(
+  since: number,
+  onChange: (change: MessageChange<T>) => void,
+  onReset?: () => void
+): (() => void) => {
+  let lastSeq = since;
+  let stopped = false;
+  let timer: ReturnType<typeof setTimeout> | undefined;
+  let source: EventSource | undefined;
+
+  const apply = (change: MessageChange<T>) => {
+    if (change.seq <= lastSeq) return;
+    lastSeq = change.seq;
+    onChange(change);
+  };
+
+  const poll = async () => {
+    if (stopped) return;
+    try {
+      const { data } = await axios.get(CHANGES_URL, { params: { since: lastSeq } });
+      if (data.reset) onReset?.();
+      data.changes.forEach(apply);
+      lastSeq = Math.max(lastSeq, data.last_seq);
+    } catch (error) {
+      console.error('Error polling message changes:', error);
+    }
+    timer = setTimeout(poll, POLL_INTERVAL_MS);
+  };
+
+  if (typeof EventSource === 'undefined') {
+    poll();
+  } else {
+    source = new EventSource(`${CHANGES_URL}/stream?since=${since}`);
+    source.addEventListener('change', (event) => {
+      apply(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('reset', () => onReset?.());
+    source.onerror = () => {
+      // Stream dropped (proxy timeout, restart); continue by polling
+      source?.close();
+      poll();
+    };
+  }
+
+  return () => {
+    stopped = true;
+    source?.close();
+    if (timer) clearTimeout(timer);
+  };
+};
@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pool and concurrency limits (per host)
+POOL_MAXSIZE = 10
+MAX_CONCURRENT_REQUESTS = 4
+
+# Retry policy
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Seconds, doubled on every attempt
+BACKOFF_MAX = 8
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+DEFAULT_TIMEOUT = (5, 15)  # (connect, read) in seconds
+
+# Enrichment lookups are deferred and retried later, so they give up early instead of stalling ingestion:
+# at most 2 x (2 s + 5 s) plus one backoff per call while a host is down
+ENRICHMENT_RETRIES = 1
+ENRICHMENT_TIMEOUT = (2, 5)
+
+# Circuit breaker
+FAILURE_THRESHOLD = 5  # Consecutive failed calls before the circuit opens
+RESET_TIMEOUT = 60  # Seconds before a single probe request is let through
+
+
+class SourceUnavailable(Exception):
+    """Raised when a host is down or its circuit is open, so the caller can defer the work."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let exactly one probe through once the reset timeout has passed
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        """Close the circuit; returns True when it was open until now."""
+        with self.lock:
+            was_open = self.opened_at is not None
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            return was_open
+
+    def release_probe(self):
+        """End a probe that neither succeeded nor failed, so the next call can probe again."""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class HostPool:
+    """Keep-alive session, concurrency limit and circuit breaker for one host."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self.breaker = CircuitBreaker()
+
+
+class HttpClient:
+    def __init__(self):
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.recovery_listeners = []
+
+    def add_recovery_listener(self, listener):
+        """Call listener(host) whenever the circuit of a host closes again after a successful probe."""
+        self.recovery_listeners.append(listener)
+
+    def _host_pool(self, host):
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostPool()
+            return self.hosts[host]
+
+    @staticmethod
+    def _backoff(attempt, response=None):
+        """Exponential backoff with full jitter, honouring Retry-After when the server sends one."""
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), BACKOFF_MAX))
+        return delay
+
+    def request(self, method, url, retries=MAX_RETRIES, **kwargs):
+        host = urlsplit(url).netloc
+        pool = self._host_pool(host)
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+
+        if not pool.breaker.allow_request():
+            raise SourceUnavailable(f"Circuit open for {host}, skipping request to {url}")
+
+        last_error = None
+        last_response = None
+        recorded = False
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(self._backoff(attempt, last_response))
+                try:
+                    with pool.semaphore:
+                        response = pool.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    print(f"Request to {host} failed (attempt {attempt + 1}): {e}")
+                    last_error, last_response = e, None
+                    continue
+
+                if response.status_code in RETRY_STATUS_CODES:
+                    print(f"Request to {host} returned {response.status_code} (attempt {attempt + 1})")
+                    last_error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+                    last_response = response
+                    response.close()
+                    continue
+
+                recovered = pool.breaker.record_success()
+                recorded = True
+                if recovered:
+                    print(f"Circuit for {host} closed again")
+                    for listener in self.recovery_listeners:
+                        listener(host)
+                return response
+
+            pool.breaker.record_failure()
+            recorded = True
+            raise SourceUnavailable(f"{host} unavailable after {retries + 1} attempts: {last_error}") from last_error
+        finally:
+            # Non-retryable errors (redirect loops, broken chunked bodies, bad URLs) must not leave a probe pending
+            if not recorded:
+                pool.breaker.release_probe()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def circuit_status(self):
+        with self.lock:
+            return {host: ("open" if pool.breaker.is_open else "closed") for host, pool in self.hosts.items()}
+
+
+# Shared client used by all external lookups
+http_client = HttpClient()
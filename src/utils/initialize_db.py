@@ -1,39 +1,39 @@
 import sqlite3
 
+try:
+    from .blacklistStore import initialize_blacklist_tables
+    from .screeningCache import initialize_screening_cache_tables
+    from .messageStore import get_message_store
+    from .riskRules import initialize_risk_tables
+    from .paymentPatterns import initialize_payment_flag_tables
+except ImportError:
+    from blacklistStore import initialize_blacklist_tables
+    from screeningCache import initialize_screening_cache_tables
+    from messageStore import get_message_store
+    from riskRules import initialize_risk_tables
+    from paymentPatterns import initialize_payment_flag_tables
+
 # Path to the SQLite database file
 DATABASE_PATH = 'swift_messages.db'
 
 def initialize_db():
-    # Connect to the database
+    # Messages and the pending enrichment queue, in SQLite monthly partitions
+    # or in PostgreSQL depending on SWIFT_DATABASE_URL
+    get_message_store().initialize()
+
+    # Connect to the local database
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
 
-    # Create the `swift_messages` table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS swift_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        transaction_reference TEXT,
-        transaction_type TEXT,
-        transaction_date TEXT,
-        transaction_currency TEXT,
-        transaction_amount TEXT,
-        sender_account TEXT,
-        sender_inn TEXT,
-        sender_name TEXT,
-        sender_address TEXT,
-        sender_bank_code TEXT,
-        receiver_account TEXT,
-        receiver_inn TEXT,
-        receiver_name TEXT,
-        receiver_kpp TEXT,
-        receiver_bank_code TEXT,
-        receiver_bank_name TEXT,
-        transaction_purpose TEXT,
-        transaction_fees TEXT,
-        company_info TEXT,
-        receiver_info TEXT
-    )
-    ''')
+    # Blacklist entries with their INN and name n-gram indexes
+    initialize_blacklist_tables(cursor)
+    # Screening results per normalized name and list versions
+    initialize_screening_cache_tables(cursor)
+    # Versioned risk rule sets and per-rule scores of each message
+    initialize_risk_tables(cursor)
+    # Duplicate and structuring flags raised at ingest
+    initialize_payment_flag_tables(cursor)
+
     conn.commit()
     conn.close()
 
@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = 4  # Background threads running enrichment jobs
+JOB_TTL = 3600  # Seconds a finished job stays available for polling
+PRUNE_INTERVAL = 60  # Seconds between sweeps for expired jobs
+HEARTBEAT_INTERVAL = 15  # Seconds between SSE keep-alive comments
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and records their progress events.
+
+    Jobs live in the memory of this process only: they are lost on restart,
+    and behind several server processes a job can only be followed through the
+    process it was submitted to.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="swift-job")
+        self.jobs = {}
+        self.condition = threading.Condition()
+        self.pruned_at = time.time()
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args, report) and return the new job id.
+
+        fn receives a report(stage, **data) callback for progress updates and its
+        return value becomes the job result.
+        """
+        job = Job(uuid.uuid4().hex)
+        with self.condition:
+            self._prune()
+            self.jobs[job.id] = job
+            self._emit(job, "queued")
+
+        def report(stage, **data):
+            with self.condition:
+                job.stage = stage
+                self._emit(job, "progress", stage=stage, **data)
+
+        def run():
+            with self.condition:
+                job.status = "running"
+                self._emit(job, "running")
+            try:
+                result = fn(*args, report)
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                with self.condition:
+                    job.status, job.error, job.finished_at = "failed", str(e), time.time()
+                    self._emit(job, "failed", error=str(e))
+                return
+            with self.condition:
+                # The done event refers to job.result, so the result is held once
+                job.status, job.result, job.finished_at = "done", result, time.time()
+                self._emit(job, "done")
+
+        self.executor.submit(run)
+        return job.id
+
+    def get(self, job_id):
+        with self.condition:
+            self._prune()
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def stream(self, *job_ids):
+        """Yield Server-Sent Events for one or more jobs until all of them finish."""
+        sent = dict.fromkeys(job_ids, 0)
+        while sent:
+            with self.condition:
+                self._prune()
+                jobs = {job_id: self.jobs.get(job_id) for job_id in sent}
+                # Jobs pruned while being followed have nothing more to send
+                for job_id in [job_id for job_id, job in jobs.items() if job is None]:
+                    del jobs[job_id], sent[job_id]
+                if not jobs:
+                    return
+                if all(sent[job_id] == len(job.events) and job.finished_at is None for job_id, job in jobs.items()):
+                    self.condition.wait(HEARTBEAT_INTERVAL)
+                pending = [(job_id, job.events[sent[job_id]:], job.finished_at is not None) for job_id, job in jobs.items()]
+            if not any(events for _, events, _ in pending):
+                yield ": keep-alive\n\n"
+            for job_id, events, finished in pending:
+                for event, data in events:
+                    if event == "done":
+                        data = {**data, "result": jobs[job_id].result}
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                sent[job_id] += len(events)
+                if finished and sent[job_id] == len(jobs[job_id].events):
+                    del sent[job_id]
+
+    def _emit(self, job, event, **data):
+        # Caller must hold self.condition
+        job.events.append((event, {"job_id": job.id, "status": job.status, **data}))
+        self.condition.notify_all()
+
+    def _prune(self):
+        # Caller must hold self.condition
+        now = time.time()
+        if now - self.pruned_at < PRUNE_INTERVAL:
+            return
+        self.pruned_at = now
+        cutoff = now - JOB_TTL
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
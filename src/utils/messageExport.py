@@ -0,0 +1,161 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+
+try:
+    from .messageStore import build_message_filters, get_message_store, configure_message_store, DATABASE_PATH
+except ImportError:
+    from messageStore import build_message_filters, get_message_store, configure_message_store, DATABASE_PATH
+
+export_api = Blueprint('export_api', __name__)
+
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched from the cursor per round trip
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_message_chunks(filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield (columns, rows) chunks from a server-side cursor over the matching messages."""
+    return get_message_store().iter_message_chunks(filters, chunk_size=chunk_size)
+
+
+def iter_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in chunks:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def iter_ndjson(chunks):
+    for columns, rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(chunks):
+    """Write one Parquet row group per chunk; requires the optional pyarrow package."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the pyarrow package")
+
+    sink = _ChunkSink()
+    writer = None
+    for columns, rows in chunks:
+        # Every column is exported as text, matching the TEXT columns in SQLite
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        table = pa.table({column: [None if row[i] is None else str(row[i]) for row in rows]
+                          for i, column in enumerate(columns)}, schema=schema)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+    "parquet": iter_parquet,
+}
+
+
+def export_messages(filters, export_format):
+    return EXPORT_WRITERS[export_format](iter_message_chunks(filters))
+
+
+@export_api.route('/api/export-messages', methods=['GET'])
+def api_export_messages():
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({"error": "Parquet export requires the pyarrow package"}), 501
+    try:
+        build_message_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filter value: {e}"}), 400
+
+    return Response(
+        stream_with_context(export_messages(request.args.to_dict(), export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=swift_messages.{export_format}",
+                 # Months whose messages are only in their archive and therefore not exported
+                 "X-Archived-Partitions": ",".join(get_message_store().archived_months(request.args))}
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export swift_messages as CSV, NDJSON or Parquet.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--output", help="Output file (defaults to stdout)")
+    parser.add_argument("--database", default=DATABASE_PATH, help="SQLite path or postgresql:// URL")
+    for name in ("search", "dateFrom", "dateTo", "amountFrom", "amountTo", "senderName",
+                 "receiverName", "bankName", "reference", "status"):
+        parser.add_argument(f"--{name}")
+    args = parser.parse_args()
+
+    configure_message_store(args.database)
+    filters = {key: value for key, value in vars(args).items() if value is not None and key != "database"}
+    binary = args.format == "parquet"
+    archived = get_message_store().archived_months(filters)
+    if archived:
+        print(f"Not exported, archived months: {', '.join(archived)} (restore them with partitionStore.py restore)", file=sys.stderr)
+
+    if args.output:
+        out = open(args.output, "wb" if binary else "w", encoding=None if binary else "utf-8", newline=None if binary else "")
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+    try:
+        for piece in export_messages(filters, args.format):
+            out.write(piece)
+    finally:
+        if args.output:
+            out.close()
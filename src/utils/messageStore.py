@@ -0,0 +1,850 @@
+import argparse
+import csv
+import io
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    from .partitionStore import (
+        MESSAGE_COLUMNS, initialize_partitions, insert_message, reference_exists, messages_source, archived_partitions,
+        update_messages as update_partitioned_messages, delete_message as delete_partitioned_message,
+    )
+    from .nameKeys import compute_name_keys
+except ImportError:
+    from partitionStore import (
+        MESSAGE_COLUMNS, initialize_partitions, insert_message, reference_exists, messages_source, archived_partitions,
+        update_messages as update_partitioned_messages, delete_message as delete_partitioned_message,
+    )
+    from nameKeys import compute_name_keys
+
+DATABASE_PATH = 'swift_messages.db'
+# SQLite path or postgresql:// URL of the message store; defaults to the local SQLite file
+DATABASE_URL_ENV = 'SWIFT_DATABASE_URL'
+STORE_CHUNK_SIZE = 1000  # Rows fetched per round trip when streaming messages
+ID_LOOKUP_BATCH = 500  # Ids per IN (...) lookup, below SQLite's bound parameter limit
+POOL_MAX_CONNECTIONS = 10
+CHANGE_RETENTION = 100000  # Most recent change feed entries kept; older ones are pruned on startup
+
+COLUMN_NAMES = [column for column, _ in MESSAGE_COLUMNS]
+JSON_COLUMNS = {"company_info", "receiver_info", "blacklist_matches"}
+ID_SEQUENCE = "swift_messages_id_seq"  # Sequence behind the BIGSERIAL id of the PostgreSQL table
+FEED_PUBLISH_LOCK_KEY = 0x5357494654  # PostgreSQL advisory lock key taken while numbering change feed entries
+NODE_LOCK_KEY = 0x53574E44  # PostgreSQL advisory lock class held by the node the store is attached to
+AMOUNT_SQL = "CAST(transaction_amount AS REAL)"
+# PostgreSQL raises on a cast of non-numeric text, where SQLite yields 0; those amounts match no bound instead
+PG_AMOUNT_SQL = r"(CASE WHEN transaction_amount ~ '^\s*[0-9]+(\.[0-9]*)?\s*$' THEN CAST(transaction_amount AS DOUBLE PRECISION) END)"
+
+
+class StorageError(Exception):
+    """Raised for database errors of any message store backend."""
+
+
+def build_message_filters(filters):
+    """Translate the dashboard filter fields into a WHERE clause and its parameters."""
+    clauses, params = [], []
+
+    def like_any(columns, value):
+        clauses.append("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")")
+        params.extend([f"%{value}%"] * len(columns))
+
+    if filters.get("search"):
+        like_any(["sender_name", "receiver_name", "sender_bank_code", "receiver_bank_code",
+                  "receiver_bank_name", "transaction_reference"], filters["search"])
+    if filters.get("senderName"):
+        like_any(["sender_name"], filters["senderName"])
+    if filters.get("receiverName"):
+        like_any(["receiver_name"], filters["receiverName"])
+    if filters.get("reference"):
+        like_any(["transaction_reference"], filters["reference"])
+    if filters.get("bankName"):
+        like_any(["receiver_bank_name", "sender_bank_code", "receiver_bank_code"], filters["bankName"])
+    if filters.get("dateFrom"):
+        clauses.append("transaction_date >= ?")
+        params.append(filters["dateFrom"])
+    if filters.get("dateTo"):
+        clauses.append("transaction_date <= ?")
+        params.append(filters["dateTo"])
+    if filters.get("amountFrom"):
+        clauses.append(f"{AMOUNT_SQL} >= ?")
+        params.append(float(filters["amountFrom"]))
+    if filters.get("amountTo"):
+        clauses.append(f"{AMOUNT_SQL} <= ?")
+        params.append(float(filters["amountTo"]))
+    if filters.get("status"):
+        clauses.append("status = ?")
+        params.append(filters["status"])
+
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+def party_name_keys(parsed_data):
+    """Match keys for sender and receiver, as stored alongside the message."""
+    keys = {}
+    for role in ("sender", "receiver"):
+        name = parsed_data.get(f"{role}_name")
+        name_keys = compute_name_keys(name) if name else {}
+        keys[f"{role}_name_key"] = name_keys.get("name_key")
+        keys[f"{role}_phonetic_key"] = name_keys.get("phonetic_key")
+    return keys
+
+
+def _check_columns(columns):
+    unknown = [column for column in columns if column not in COLUMN_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown message columns: {', '.join(unknown)}")
+
+
+class MessageStore(ABC):
+    """Persistence of swift_messages and the pending enrichment queue.
+
+    JSON columns (company_info, receiver_info, blacklist_matches) are passed in
+    and returned as JSON text by every backend. Every insert, update and delete
+    also appends to message_changes in the same transaction, which gives the
+    change feed its order; listeners are called after each such commit.
+    """
+
+    def __init__(self):
+        self.change_listeners = []
+
+    def add_change_listener(self, listener):
+        self.change_listeners.append(listener)
+
+    def _notify_change(self):
+        for listener in self.change_listeners:
+            listener()
+
+    @abstractmethod
+    def initialize(self):
+        pass
+
+    @abstractmethod
+    def save_message(self, values, pending_enrichment=()):
+        """Insert a message and queue its deferred lookups; returns its id, or None for a known reference."""
+
+    @abstractmethod
+    def bulk_insert(self, rows, pending_enrichment=None):
+        """Insert many messages, skipping known references; returns the (id, reference) pairs inserted.
+
+        Rows carrying an id keep it, and later inserts are numbered above it.
+        pending_enrichment maps a reference to its deferred lookups, which are
+        queued only when that reference is inserted.
+        """
+
+    @abstractmethod
+    def update_messages(self, values, message_id=None, transaction_reference=None):
+        pass
+
+    @abstractmethod
+    def delete_message(self, message_id):
+        pass
+
+    @abstractmethod
+    def iter_message_chunks(self, filters, columns=None, chunk_size=STORE_CHUNK_SIZE):
+        """Yield (columns, rows) chunks of the messages matching the dashboard filters, ordered by id."""
+
+    @abstractmethod
+    def messages_by_id(self, ids, columns=None):
+        """Messages as {id: row dict} with id plus the requested columns; unknown ids are left out."""
+
+    @abstractmethod
+    def latest_transaction_date(self):
+        pass
+
+    @abstractmethod
+    def pending_enrichment(self, limit):
+        """Oldest queued lookups as (transaction_reference, field, lookup_key)."""
+
+    @abstractmethod
+    def defer_enrichment(self, transaction_reference, field, error):
+        pass
+
+    @abstractmethod
+    def complete_enrichment(self, transaction_reference, field, value):
+        """Store a lookup result on its message and remove it from the queue."""
+
+    @abstractmethod
+    def changes_since(self, seq, limit):
+        """Changes after seq in order, as dicts with the current row for inserts and updates."""
+
+    def publish_changes(self):
+        """Make committed changes readable through changes_since.
+
+        Called by the single change feed publisher of a process, never by
+        readers. A no-op where seq order is already commit order.
+        """
+
+    @abstractmethod
+    def change_bounds(self):
+        """(oldest, latest) retained change seq, or (None, None) while the feed is empty."""
+
+    def archived_months(self, filters):
+        """Archived months ('YYYY_MM') the filters' date range overlaps; their messages are not listed or exported."""
+        return []
+
+    def list_messages(self, filters):
+        messages = []
+        for columns, rows in self.iter_message_chunks(filters):
+            messages.extend(dict(zip(columns, row)) for row in rows)
+        return messages
+
+
+def _change_entries(changes, rows):
+    messages = {row["id"]: row for row in rows}
+    return [{"seq": seq, "operation": operation, "id": message_id, "transaction_reference": reference,
+             "changed_at": changed_at, "message": None if operation == "delete" else messages.get(message_id)}
+            for seq, message_id, reference, operation, changed_at in changes]
+
+
+PENDING_ENRICHMENT_SQL = '''
+    CREATE TABLE IF NOT EXISTS pending_enrichment (
+        transaction_reference TEXT NOT NULL,
+        field TEXT NOT NULL,
+        lookup_key TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        last_error TEXT,
+        queued_at TEXT,
+        PRIMARY KEY (transaction_reference, field)
+    )
+'''
+
+
+class SQLiteMessageStore(MessageStore):
+    """Single-file store over the monthly partitions of partitionStore."""
+
+    def __init__(self, path=DATABASE_PATH):
+        super().__init__()
+        self.path = path
+
+    @contextmanager
+    def _cursor(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn.cursor()
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise StorageError(str(e)) from e
+        finally:
+            conn.close()
+
+    def initialize(self):
+        with self._cursor() as cursor:
+            # WAL lets long streaming reads (exports, re-scoring) run alongside ingest instead of
+            # blocking its writes; the mode is stored in the file and applies to every connection
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # swift_messages is a view over monthly partition tables
+            initialize_partitions(cursor)
+            # Enrichment lookups deferred while an external source was unavailable
+            cursor.execute(PENDING_ENRICHMENT_SQL)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS message_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                message_id INTEGER NOT NULL,
+                transaction_reference TEXT,
+                operation TEXT NOT NULL,
+                changed_at TEXT
+            )
+            ''')
+            cursor.execute("DELETE FROM message_changes WHERE seq <= (SELECT MAX(seq) FROM message_changes) - ?", (CHANGE_RETENTION,))
+            self._backfill_name_keys(cursor)
+
+    @staticmethod
+    def _record_changes(cursor, operation, where, params):
+        """Append a change for every message_index row matching where (by id or reference)."""
+        cursor.execute(
+            f"INSERT INTO message_changes (message_id, transaction_reference, operation, changed_at) "
+            f"SELECT id, transaction_reference, ?, ? FROM message_index WHERE {where}",
+            (operation, datetime.now().isoformat(), *params)
+        )
+
+    def _backfill_name_keys(self, cursor):
+        """Compute match keys for messages stored before keys were persisted."""
+        cursor.execute('''
+            SELECT id, sender_name, receiver_name FROM swift_messages
+            WHERE (sender_name IS NOT NULL AND sender_name_key IS NULL)
+               OR (receiver_name IS NOT NULL AND receiver_name_key IS NULL)
+        ''')
+        for message_id, sender_name, receiver_name in cursor.fetchall():
+            update_partitioned_messages(cursor, party_name_keys({"sender_name": sender_name, "receiver_name": receiver_name}), message_id=message_id)
+
+    def save_message(self, values, pending_enrichment=()):
+        with self._cursor() as cursor:
+            if reference_exists(cursor, values.get("transaction_reference")):
+                return None
+            # Proceed with insertion into the partition of the transaction month
+            message_id = insert_message(cursor, values)
+            self._record_changes(cursor, "insert", "id = ?", (message_id,))
+            self._queue_enrichment(cursor, values.get("transaction_reference"), pending_enrichment)
+        self._notify_change()
+        return message_id
+
+    @staticmethod
+    def _queue_enrichment(cursor, transaction_reference, pending_enrichment):
+        queued_at = datetime.now().isoformat()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO pending_enrichment (transaction_reference, field, lookup_key, queued_at)
+            VALUES (?, ?, ?, ?)
+        ''', [(transaction_reference, pending["field"], pending["lookup_key"], queued_at) for pending in pending_enrichment])
+
+    def bulk_insert(self, rows, pending_enrichment=None):
+        inserted = []
+        with self._cursor() as cursor:
+            for values in rows:
+                reference = values.get("transaction_reference")
+                if not reference_exists(cursor, reference):
+                    message_id = insert_message(cursor, values)
+                    self._record_changes(cursor, "insert", "id = ?", (message_id,))
+                    self._queue_enrichment(cursor, reference, (pending_enrichment or {}).get(reference, ()))
+                    inserted.append((message_id, reference))
+        if inserted:
+            self._notify_change()
+        return inserted
+
+    def update_messages(self, values, message_id=None, transaction_reference=None):
+        _check_columns(values)
+        with self._cursor() as cursor:
+            updated = update_partitioned_messages(cursor, values, message_id=message_id, transaction_reference=transaction_reference)
+            if updated:
+                self._record_changes(cursor, "update", *(("id = ?", (message_id,)) if message_id is not None
+                                                         else ("transaction_reference = ?", (transaction_reference,))))
+        if updated:
+            self._notify_change()
+        return updated
+
+    def delete_message(self, message_id):
+        with self._cursor() as cursor:
+            # Recorded first: the message_index row goes away with the message
+            self._record_changes(cursor, "delete", "id = ?", (message_id,))
+            # Execute the delete command against the owning partition
+            deleted = delete_partitioned_message(cursor, message_id)
+            if not deleted:
+                cursor.connection.rollback()
+        if deleted:
+            self._notify_change()
+        return deleted
+
+    def iter_message_chunks(self, filters, columns=None, chunk_size=STORE_CHUNK_SIZE):
+        if columns:
+            _check_columns([column for column in columns if column != "id"])
+        where, params = build_message_filters(filters)
+        conn = sqlite3.connect(self.path)
+        try:
+            source = messages_source(conn.cursor(), filters.get("dateFrom"), filters.get("dateTo"))
+            cursor = conn.execute(f"SELECT {', '.join(columns) if columns else '*'} FROM {source}{where} ORDER BY id", params)
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield names, rows
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        finally:
+            conn.close()
+
+    def archived_months(self, filters):
+        with self._cursor() as cursor:
+            return archived_partitions(cursor, filters.get("dateFrom"), filters.get("dateTo"))
+
+    @staticmethod
+    def _select_by_id(cursor, ids, columns=None):
+        selects = ", ".join(["id"] + [column for column in columns if column != "id"]) if columns else "*"
+        rows = []
+        for start in range(0, len(ids), ID_LOOKUP_BATCH):
+            batch = ids[start:start + ID_LOOKUP_BATCH]
+            cursor.execute(f"SELECT {selects} FROM swift_messages WHERE id IN ({', '.join('?' * len(batch))})", batch)
+            names = [column[0] for column in cursor.description]
+            rows.extend(dict(zip(names, row)) for row in cursor.fetchall())
+        return rows
+
+    def messages_by_id(self, ids, columns=None):
+        if columns:
+            _check_columns([column for column in columns if column != "id"])
+        ids = sorted({int(message_id) for message_id in ids})
+        if not ids:
+            return {}
+        with self._cursor() as cursor:
+            return {row["id"]: row for row in self._select_by_id(cursor, ids, columns)}
+
+    def latest_transaction_date(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT MAX(transaction_date) FROM swift_messages")
+            return cursor.fetchone()[0]
+
+    def pending_enrichment(self, limit):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT transaction_reference, field, lookup_key FROM pending_enrichment ORDER BY queued_at LIMIT ?",
+                (limit,)
+            )
+            return cursor.fetchall()
+
+    def defer_enrichment(self, transaction_reference, field, error):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE pending_enrichment SET attempts = attempts + 1, last_error = ? WHERE transaction_reference = ? AND field = ?",
+                (error, transaction_reference, field)
+            )
+
+    def complete_enrichment(self, transaction_reference, field, value):
+        _check_columns([field])
+        with self._cursor() as cursor:
+            if update_partitioned_messages(cursor, {field: value}, transaction_reference=transaction_reference):
+                self._record_changes(cursor, "update", "transaction_reference = ?", (transaction_reference,))
+            cursor.execute(
+                "DELETE FROM pending_enrichment WHERE transaction_reference = ? AND field = ?",
+                (transaction_reference, field)
+            )
+        self._notify_change()
+
+    def changes_since(self, seq, limit):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT seq, message_id, transaction_reference, operation, changed_at FROM message_changes "
+                "WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            )
+            changes = cursor.fetchall()
+            ids = sorted({change[1] for change in changes if change[3] != "delete"})
+            rows = self._select_by_id(cursor, ids)
+        return _change_entries(changes, rows)
+
+    def change_bounds(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT MIN(seq), MAX(seq) FROM message_changes")
+            return cursor.fetchone()
+
+
+class PostgresMessageStore(MessageStore):
+    """Message store on PostgreSQL; requires the optional psycopg2 package.
+
+    Only the messages, the enrichment queue and the change feed live here.
+    The blacklist, screening cache, risk scores, payment flags and the payment
+    pattern window stay in the local SQLite file and process memory of the
+    node, so a database is attached to a single node at a time: initialize
+    fails with StorageError while another host holds it. Processes on the same
+    host share it, and any number of them may write concurrently; the unique
+    index on transaction_reference resolves concurrent inserts of the same
+    message to a single row. The change feed needs PostgreSQL 13 or later for
+    its transaction ids.
+    """
+
+    def __init__(self, dsn, max_connections=POOL_MAX_CONNECTIONS):
+        try:
+            import psycopg2
+            import psycopg2.pool
+        except ImportError:
+            raise RuntimeError("The PostgreSQL message store requires the psycopg2 package")
+        super().__init__()
+        self.dsn = dsn
+        self.driver_error = psycopg2.Error
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, dsn)
+        self.node_lock = None  # Connection holding this host's claim on the database, see _attach_node
+        # ThreadedConnectionPool raises instead of waiting when exhausted
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    @contextmanager
+    def _connection(self):
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                with conn:  # Commits on success, rolls back on error
+                    yield conn
+            except self.driver_error as e:
+                raise StorageError(str(e)) from e
+            finally:
+                self.pool.putconn(conn)
+
+    @contextmanager
+    def _cursor(self):
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+
+    def _attach_node(self):
+        """Claim the database for this host, or raise StorageError while another host holds it.
+
+        Each host holds a shared session lock keyed by a hash of its name on a
+        connection kept open for the life of the process, so the claim ends
+        with the last process of the host, crashed or not. The check and the
+        claim run under a transaction lock, so two hosts starting at once cannot
+        both pass.
+        """
+        import psycopg2
+        if self.node_lock is not None:
+            return
+        host_key = zlib.crc32(socket.gethostname().encode()) & 0x7fffffff or 1  # 0 is the key of the check lock
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s, 0)", (NODE_LOCK_KEY,))
+                cursor.execute('''
+                    SELECT 1 FROM pg_locks
+                    WHERE locktype = 'advisory' AND granted AND classid = %s AND objsubid = 2 AND objid NOT IN (0, %s)
+                      AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+                ''', (NODE_LOCK_KEY, host_key))
+                if cursor.fetchone():
+                    raise StorageError(
+                        "The PostgreSQL message store is attached to another node; blacklist, screening, "
+                        "risk and payment flag data are node-local, so only one node may use it at a time"
+                    )
+                cursor.execute("SELECT pg_advisory_lock_shared(%s, %s)", (NODE_LOCK_KEY, host_key))
+        except psycopg2.Error as e:
+            conn.close()
+            raise StorageError(str(e)) from e
+        except StorageError:
+            conn.close()
+            raise
+        self.node_lock = conn
+
+    def initialize(self):
+        self._attach_node()
+        columns_sql = ",\n            ".join(
+            f"{column} {'JSONB' if column in JSON_COLUMNS else column_type}"
+            for column, column_type in MESSAGE_COLUMNS if column != "transaction_reference"
+        )
+        with self._cursor() as cursor:
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS swift_messages (
+                id BIGSERIAL PRIMARY KEY,
+                transaction_reference TEXT UNIQUE,
+                {columns_sql}
+            )
+            ''')
+            for column in ("transaction_date", "status", "sender_inn", "receiver_inn", "sender_name_key",
+                           "sender_phonetic_key", "receiver_name_key", "receiver_phonetic_key"):
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_swift_messages_{column} ON swift_messages ({column})")
+            for column in JSON_COLUMNS:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_swift_messages_{column} ON swift_messages USING GIN ({column} jsonb_path_ops)"
+                )
+            cursor.execute(PENDING_ENRICHMENT_SQL)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pending_enrichment_queued_at ON pending_enrichment (queued_at)")
+            # feed_position is the feed order, assigned by _publish_changes once the writing transaction has finished
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS message_changes (
+                seq BIGSERIAL PRIMARY KEY,
+                message_id BIGINT NOT NULL,
+                transaction_reference TEXT,
+                operation TEXT NOT NULL,
+                changed_at TEXT,
+                txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+                feed_position BIGINT UNIQUE
+            )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_message_changes_unpublished ON message_changes (txid) WHERE feed_position IS NULL")
+            cursor.execute(
+                "DELETE FROM message_changes WHERE feed_position <= (SELECT MAX(feed_position) FROM message_changes) - %s", (CHANGE_RETENTION,)
+            )
+
+    @staticmethod
+    def _record_changes(cursor, operation, changed):
+        """Append changes for (id, reference) pairs; each row records the writing transaction in txid."""
+        if not changed:
+            return
+        changed_at = datetime.now().isoformat()
+        cursor.executemany(
+            "INSERT INTO message_changes (message_id, transaction_reference, operation, changed_at) VALUES (%s, %s, %s, %s)",
+            [(message_id, reference, operation, changed_at) for message_id, reference in changed]
+        )
+
+    @staticmethod
+    def _placeholder(column):
+        return "%s::jsonb" if column in JSON_COLUMNS else "%s"
+
+    def save_message(self, values, pending_enrichment=()):
+        columns = [column for column in COLUMN_NAMES if column in values]
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO swift_messages ({', '.join(columns)}) VALUES ({', '.join(map(self._placeholder, columns))}) "
+                "ON CONFLICT (transaction_reference) DO NOTHING RETURNING id",
+                [values[column] for column in columns]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            self._record_changes(cursor, "insert", [(row[0], values.get("transaction_reference"))])
+            self._queue_enrichment(cursor, [(values.get("transaction_reference"), pending) for pending in pending_enrichment])
+        self._notify_change()
+        return row[0]
+
+    @staticmethod
+    def _queue_enrichment(cursor, queued):
+        """Queue (reference, lookup) pairs; a lookup already queued for the same field is replaced."""
+        queued_at = datetime.now().isoformat()
+        cursor.executemany('''
+            INSERT INTO pending_enrichment (transaction_reference, field, lookup_key, queued_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (transaction_reference, field)
+            DO UPDATE SET lookup_key = EXCLUDED.lookup_key, queued_at = EXCLUDED.queued_at
+        ''', [(reference, pending["field"], pending["lookup_key"], queued_at) for reference, pending in queued])
+
+    def bulk_insert(self, rows, pending_enrichment=None):
+        """COPY the rows into a temp table, then move them over in one INSERT that skips known references."""
+        rows = list(rows)
+        if not rows:
+            return []
+        load_columns = ["id"] + COLUMN_NAMES
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for values in rows:
+            writer.writerow([r'\N' if values.get(column) is None else values[column] for column in load_columns])
+        buffer.seek(0)
+
+        columns = ", ".join(load_columns)
+        with self._cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE swift_messages_load (" + ", ".join(f"{column} TEXT" for column in load_columns) + ") ON COMMIT DROP"
+            )
+            cursor.copy_expert(f"COPY swift_messages_load ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+            selects = ", ".join(f"{column}::jsonb" if column in JSON_COLUMNS else column for column in COLUMN_NAMES)
+            cursor.execute(
+                f"INSERT INTO swift_messages ({columns}) "
+                f"SELECT COALESCE(id::bigint, nextval('{ID_SEQUENCE}')), {selects} FROM swift_messages_load "
+                "ON CONFLICT (transaction_reference) DO NOTHING RETURNING id, transaction_reference"
+            )
+            inserted = cursor.fetchall()
+            if any(values.get("id") is not None for values in rows):
+                # Move the sequence past the carried ids; last_value keeps it from going back below
+                # ids other sessions have already drawn
+                cursor.execute(
+                    f"SELECT setval('{ID_SEQUENCE}', GREATEST(MAX(id), (SELECT last_value FROM {ID_SEQUENCE}))) FROM swift_messages"
+                )
+            self._record_changes(cursor, "insert", inserted)
+            self._queue_enrichment(cursor, [(reference, pending) for _, reference in inserted
+                                            for pending in (pending_enrichment or {}).get(reference, ())])
+        if inserted:
+            self._notify_change()
+        return inserted
+
+    def update_messages(self, values, message_id=None, transaction_reference=None):
+        _check_columns(values)
+        assignments = ", ".join(f"{column} = {self._placeholder(column)}" for column in values)
+        where, key = ("id = %s", message_id) if message_id is not None else ("transaction_reference = %s", transaction_reference)
+        if message_id is not None and not str(message_id).isdigit():
+            return 0
+        with self._cursor() as cursor:
+            cursor.execute(f"UPDATE swift_messages SET {assignments} WHERE {where} RETURNING id, transaction_reference",
+                           (*values.values(), key))
+            updated = cursor.fetchall()
+            self._record_changes(cursor, "update", updated)
+        if updated:
+            self._notify_change()
+        return len(updated)
+
+    def delete_message(self, message_id):
+        if not str(message_id).isdigit():
+            return 0
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM swift_messages WHERE id = %s RETURNING id, transaction_reference", (int(message_id),))
+            deleted = cursor.fetchall()
+            self._record_changes(cursor, "delete", deleted)
+        if deleted:
+            self._notify_change()
+        return len(deleted)
+
+    def iter_message_chunks(self, filters, columns=None, chunk_size=STORE_CHUNK_SIZE):
+        columns = list(columns or ["id"] + COLUMN_NAMES)
+        _check_columns([column for column in columns if column != "id"])
+        where, params = build_message_filters(filters)
+        # Same filters as SQLite: LIKE there is case-insensitive for ASCII
+        where = where.replace("?", "%s").replace(" LIKE ", " ILIKE ").replace(AMOUNT_SQL, PG_AMOUNT_SQL)
+        # JSONB comes back as text, exactly as the SQLite store returns it
+        selects = ", ".join(f"{column}::text AS {column}" if column in JSON_COLUMNS else column for column in columns)
+
+        with self._connection() as conn:
+            # Named cursors are server-side, so only one chunk is held in memory
+            with conn.cursor(name=f"messages_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(f"SELECT {selects} FROM swift_messages{where} ORDER BY id", params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield columns, rows
+
+    @staticmethod
+    def _select_by_id(cursor, ids, columns=None):
+        columns = ["id"] + [column for column in columns or COLUMN_NAMES if column != "id"]
+        # JSONB comes back as text, exactly as the SQLite store returns it
+        selects = ", ".join(f"{column}::text AS {column}" if column in JSON_COLUMNS else column for column in columns)
+        cursor.execute(f"SELECT {selects} FROM swift_messages WHERE id = ANY(%s)", (ids,))
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def messages_by_id(self, ids, columns=None):
+        if columns:
+            _check_columns([column for column in columns if column != "id"])
+        ids = sorted({int(message_id) for message_id in ids})
+        if not ids:
+            return {}
+        with self._cursor() as cursor:
+            return {row["id"]: row for row in self._select_by_id(cursor, ids, columns)}
+
+    def latest_transaction_date(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT MAX(transaction_date) FROM swift_messages")
+            return cursor.fetchone()[0]
+
+    def pending_enrichment(self, limit):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT transaction_reference, field, lookup_key FROM pending_enrichment ORDER BY queued_at LIMIT %s",
+                (limit,)
+            )
+            return cursor.fetchall()
+
+    def defer_enrichment(self, transaction_reference, field, error):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE pending_enrichment SET attempts = attempts + 1, last_error = %s WHERE transaction_reference = %s AND field = %s",
+                (error, transaction_reference, field)
+            )
+
+    def complete_enrichment(self, transaction_reference, field, value):
+        _check_columns([field])
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"UPDATE swift_messages SET {field} = {self._placeholder(field)} WHERE transaction_reference = %s "
+                "RETURNING id, transaction_reference",
+                (value, transaction_reference)
+            )
+            self._record_changes(cursor, "update", cursor.fetchall())
+            cursor.execute(
+                "DELETE FROM pending_enrichment WHERE transaction_reference = %s AND field = %s",
+                (transaction_reference, field)
+            )
+        self._notify_change()
+
+    def publish_changes(self):
+        with self._cursor() as cursor:
+            self._publish_changes(cursor)
+
+    @staticmethod
+    def _publish_changes(cursor):
+        """Give feed positions to the changes of every finished transaction.
+
+        seq is drawn at insert, so with several writing nodes a lower seq can
+        commit after a higher one was already read. Feed positions avoid that
+        without making writers wait on each other: a change is only numbered
+        once its txid is below the snapshot xmin, where every transaction has
+        ended and none can add changes any more, and in (txid, seq) order, so
+        nothing published later can fall behind a feed_position already read. A
+        long-running writing transaction holds the feed back until it ends.
+        Publishers of several processes are serialized by an advisory lock; one
+        that finds it taken skips the round, the holder publishes for it.
+        """
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (FEED_PUBLISH_LOCK_KEY,))
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute('''
+            WITH ready AS (
+                SELECT seq, ROW_NUMBER() OVER (ORDER BY txid, seq) AS n FROM message_changes
+                WHERE feed_position IS NULL AND txid < pg_snapshot_xmin(pg_current_snapshot())
+            )
+            UPDATE message_changes SET feed_position = (SELECT COALESCE(MAX(feed_position), 0) FROM message_changes) + ready.n
+            FROM ready WHERE message_changes.seq = ready.seq
+        ''')
+
+    def changes_since(self, seq, limit):
+        # Feed sequence numbers of this backend are the published positions; readers never publish
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT feed_position, message_id, transaction_reference, operation, changed_at FROM message_changes "
+                "WHERE feed_position > %s ORDER BY feed_position LIMIT %s", (seq, limit)
+            )
+            changes = cursor.fetchall()
+            ids = sorted({change[1] for change in changes if change[3] != "delete"})
+            rows = self._select_by_id(cursor, ids) if ids else []
+        return _change_entries(changes, rows)
+
+    def change_bounds(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT MIN(feed_position), MAX(feed_position) FROM message_changes")
+            return cursor.fetchone()
+
+
+def open_message_store(url=None):
+    """Store for a postgresql:// URL or a SQLite file path."""
+    url = url or DATABASE_PATH
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresMessageStore(url)
+    return SQLiteMessageStore(url)
+
+
+message_store = None
+message_store_lock = threading.Lock()
+
+
+def get_message_store():
+    """Shared store, configured from SWIFT_DATABASE_URL on first use."""
+    global message_store
+    with message_store_lock:
+        if message_store is None:
+            message_store = open_message_store(os.environ.get(DATABASE_URL_ENV))
+        return message_store
+
+
+def configure_message_store(url):
+    global message_store
+    with message_store_lock:
+        message_store = open_message_store(url)
+    return message_store
+
+
+def copy_messages(source, target, chunk_size=STORE_CHUNK_SIZE):
+    """Stream every message from one store into another; the target skips references it already has.
+
+    Ids are carried over, since risk scores and payment flags refer to
+    messages by id; a target holding a different message under a copied id
+    fails with StorageError rather than renumbering it.
+    """
+    inserted = 0
+    for columns, rows in source.iter_message_chunks({}, columns=["id"] + COLUMN_NAMES, chunk_size=chunk_size):
+        inserted += len(target.bulk_insert(dict(zip(columns, row)) for row in rows))
+    return inserted
+
+
+def check_store(store):
+    """Round trip through every write path of a store, leaving no rows behind."""
+    reference = f"STORECHECK{uuid.uuid4().hex[:12].upper()}"
+    values = {"transaction_reference": reference, "transaction_date": datetime.now().strftime("%Y-%m-%d"),
+              "sender_name": "Store Check", "company_info": json.dumps({"CEO": "Check"}), **party_name_keys({"sender_name": "Store Check"})}
+    message_id = store.save_message(values, [{"field": "receiver_info", "lookup_key": "000000000"}])
+    assert message_id is not None, "insert failed"
+    assert store.save_message(values) is None, "duplicate reference was inserted"
+    assert store.update_messages({"status": "checked"}, message_id=message_id) == 1, "update by id failed"
+    store.complete_enrichment(reference, "receiver_info", json.dumps({"CEO": "Done"}))
+    found = store.list_messages({"reference": reference.lower()})
+    assert len(found) == 1 and found[0]["status"] == "checked", "filtered read failed"
+    assert json.loads(found[0]["receiver_info"]) == {"CEO": "Done"}, "enrichment update failed"
+    assert store.delete_message(message_id) == 1, "delete failed"
+    return {"store": type(store).__name__, "message_id": message_id, "status": "ok"}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Initialize, check or copy between message stores.")
+    parser.add_argument("--database", default=os.environ.get(DATABASE_URL_ENV, DATABASE_PATH),
+                        help="SQLite path or postgresql:// URL (defaults to $SWIFT_DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="Create tables and indexes")
+    commands.add_parser("check", help="Insert, update, read and delete a throwaway message")
+    copy_parser = commands.add_parser("copy", help="Bulk-copy all messages from another store into --database")
+    copy_parser.add_argument("source", help="SQLite path or postgresql:// URL to copy from")
+    args = parser.parse_args()
+
+    store = open_message_store(args.database)
+    store.initialize()
+    if args.command == "check":
+        print(json.dumps(check_store(store)))
+    elif args.command == "copy":
+        source = open_message_store(args.source)
+        source.initialize()
+        print(f"Copied {copy_messages(source, store)} messages into {args.database}")
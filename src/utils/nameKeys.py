@@ -0,0 +1,156 @@
+import re
+import unicodedata
+
+# Bumped whenever the keys below change, so keys persisted by the matchers are recomputed
+NAME_KEY_VERSION = 2
+
+# Cyrillic (Russian and Uzbek) to loose Latin, before spelling variants are folded together
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+
+# Applied in order, so longer spellings are folded before their prefixes
+LATIN_FOLDS = [
+    ("shch", "sh"), ("sch", "sh"), ("tch", "ch"), ("kh", "h"), ("x", "h"),
+    ("dzh", "j"), ("zh", "j"), ("dj", "j"), ("tz", "c"), ("ts", "c"),
+    ("ph", "f"), ("w", "v"), ("ck", "k"), ("q", "k"),
+    ("ja", "ya"), ("ju", "yu"), ("jo", "yo"), ("ia", "ya"), ("iu", "yu"),
+    ("iy", "i"), ("yy", "i"), ("ij", "i"), ("yj", "i"), ("oj", "oy"), ("y", "i"),
+]
+# -ий/-ый/-iy/-yy/-yi endings all end up as one or two i's after the folds above
+WORD_FINAL_I = re.compile(r"i+\b")
+
+# Consonant classes for the phonetic key; vowels are dropped after the first letter
+PHONETIC_CLASSES = {
+    'b': 'p', 'p': 'p', 'f': 'f', 'v': 'f',
+    'd': 't', 't': 't', 'g': 'k', 'k': 'k', 'c': 'k',
+    's': 's', 'z': 's', 'j': 'j', 'h': '',
+    'l': 'l', 'm': 'm', 'n': 'n', 'r': 'r',
+}
+
+# Phonetic keys shorter than this (letters, without separators) collide across unrelated names
+MIN_PHONETIC_KEY_LENGTH = 4
+
+# One spelling per legal form is enough: variants fold to the same tokens
+LEGAL_FORMS = [
+    "Общество с ограниченной ответственностью", "Закрытое акционерное общество",
+    "Открытое акционерное общество", "Публичное акционерное общество", "Акционерное общество",
+    "Международная компания публичное акционерное общество", "Акционерная компания",
+    "Индивидуальный предприниматель", "Государственное унитарное предприятие", "Частное предприятие",
+    "Некоммерческая организация", "Крестьянское фермерское хозяйство", "Общество",
+    "ООО", "ЗАО", "ОАО", "ПАО", "АО", "ИП", "ГУП", "ЧП", "НКО", "МКПАО", "КФХ",
+    "Limited Liability Company", "Limited Liability Partnership", "Public Limited Company",
+    "Sole Proprietorship", "Non-Governmental Organization", "Non-Profit Organization",
+    "Incorporated", "Corporation", "Limited", "Company", "Societe Anonyme",
+    "Gesellschaft mit beschrankter Haftung", "Aktiengesellschaft",
+    "LLC", "Inc", "Corp", "Ltd", "Plc", "LLP", "NGO", "NPO", "Co", "SA", "GmbH", "AG",
+    "Масъулияти чекланган жамият", "Акциядорлик жамияти", "Якка тартибдаги тадбиркор",
+    "Давлат унитар корхонаси", "Хусусий корхона", "Фуқароларнинг масъулияти чекланган жамияти",
+    "Dehqon fermer xo'jaligi", "Тадбиркорлик шерикчилиги жамияти",
+    "МЧЖ", "АЖ", "ЙТТ", "ДУК", "ХК", "ФМШЖ", "ТШЖ", "КХ",
+]
+
+
+def fold_script(text):
+    """Lowercase, transliterate Cyrillic and fold GOST/loose Latin spellings to one form."""
+    if not text:
+        return ""
+    # Transliterate on composed text: NFKD would split й and ё into и and е plus a combining mark
+    text = "".join(CYRILLIC_TO_LATIN.get(char, char) for char in unicodedata.normalize("NFC", text.lower()))
+    text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    # Soft/hard sign apostrophes and okina variants carry no sound
+    text = re.sub(r"['’ʼ`ʻ]", "", text)
+    for source, target in LATIN_FOLDS:
+        text = text.replace(source, target)
+    text = re.sub(r"[^a-z0-9]+", " ", text).strip()
+    return WORD_FINAL_I.sub("i", text)
+
+
+def phonetic_code(token):
+    if not token or token.isdigit():
+        return token
+    code = token[0]
+    previous = PHONETIC_CLASSES.get(token[0], "")
+    for char in token[1:]:
+        if char in "aeiou":
+            # A vowel separates repeated consonant classes, as in Soundex
+            previous = ""
+            continue
+        mapped = PHONETIC_CLASSES.get(char, char if char.isdigit() else "")
+        if mapped and mapped != previous:
+            code += mapped
+            previous = mapped
+    return code
+
+
+_LEGAL_FORM_TOKENS = sorted({tuple(fold_script(form).split()) for form in LEGAL_FORMS}, key=len, reverse=True)
+
+
+def strip_legal_forms(tokens):
+    result, i = [], 0
+    while i < len(tokens):
+        for form in _LEGAL_FORM_TOKENS:
+            if tuple(tokens[i:i + len(form)]) == form:
+                i += len(form)
+                break
+        else:
+            result.append(tokens[i])
+            i += 1
+    return result
+
+
+def compute_name_keys(name):
+    """Canonical match keys for a person or company name.
+
+    name_key is script-folded, legal-form-stripped and token-sorted; phonetic_key
+    applies phonetic_code to the same tokens. Names consisting only of a legal
+    form keep their folded tokens so they do not all collapse to an empty key.
+    """
+    folded = fold_script(name)
+    tokens = strip_legal_forms(folded.split()) or folded.split()
+    tokens = sorted(tokens)
+    return {
+        "folded": folded,
+        "name_key": " ".join(tokens),
+        "phonetic_key": " ".join(sorted(phonetic_code(token) for token in tokens)),
+    }
+
+
+def phonetic_join_key(keys):
+    """The phonetic key to join candidates on, or None when it is too short to narrow anything down."""
+    key = keys.get("phonetic_key") or ""
+    return key if len(key.replace(" ", "")) >= MIN_PHONETIC_KEY_LENGTH else None
+
+
+def bigram_similarity(first, second):
+    """Dice coefficient over character bigrams, as used by the frontend checkers."""
+    if first == second:
+        return 1.0
+    pairs1 = {first[i:i + 2] for i in range(len(first) - 1)}
+    pairs2 = {second[i:i + 2] for i in range(len(second) - 1)}
+    if not pairs1 or not pairs2:
+        return 0.0
+    return 2.0 * len(pairs1 & pairs2) / (len(pairs1) + len(pairs2))
+
+
+# Spellings of the same name across scripts and transliteration standards that must share a name key
+EQUIVALENT_SPELLINGS = [
+    ("Новый", "Novyy"), ("Новый", "Novyi"), ("Ёлка", "Yolka"), ("Дмитрий", "Dmitriy"), ("Дмитрий", "Dmitrii"),
+    ("Юрий", "Yuri"), ("Щукин", "Shchukin"), ("Хусусий корхона Бахор", "Bahor Xususiy korxona"),
+    ("ООО Ромашка", "Romashka LLC"),
+]
+
+
+if __name__ == '__main__':
+    import sys
+
+    for name in sys.argv[1:]:
+        print(name, compute_name_keys(name))
+    for first, second in EQUIVALENT_SPELLINGS:
+        first_key, second_key = compute_name_keys(first)["name_key"], compute_name_keys(second)["name_key"]
+        assert first_key == second_key, f"{first!r} -> {first_key!r} but {second!r} -> {second_key!r}"
+    print(f"{len(EQUIVALENT_SPELLINGS)} equivalent spellings share their name keys")
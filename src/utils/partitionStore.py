@@ -0,0 +1,512 @@
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+from datetime import datetime
+
+DATABASE_PATH = 'swift_messages.db'
+ARCHIVE_PATH = './archive'
+ARCHIVE_CHUNK_SIZE = 5000  # Rows copied per batch into an archive file
+PARTITION_PREFIX = 'swift_messages_'
+HOT_MONTHS = 3  # Months (including the current one) kept uncompressed by archive-closed
+
+# Columns of every monthly partition, in view order; `id` is assigned by message_index
+MESSAGE_COLUMNS = [
+    ("transaction_reference", "TEXT"),
+    ("transaction_type", "TEXT"),
+    ("transaction_date", "TEXT"),
+    ("transaction_currency", "TEXT"),
+    ("transaction_amount", "TEXT"),
+    ("sender_account", "TEXT"),
+    ("sender_inn", "TEXT"),
+    ("sender_name", "TEXT"),
+    ("sender_address", "TEXT"),
+    ("sender_bank_code", "TEXT"),
+    ("receiver_account", "TEXT"),
+    ("receiver_inn", "TEXT"),
+    ("receiver_name", "TEXT"),
+    ("receiver_kpp", "TEXT"),
+    ("receiver_bank_code", "TEXT"),
+    ("receiver_bank_name", "TEXT"),
+    ("transaction_purpose", "TEXT"),
+    ("transaction_fees", "TEXT"),
+    ("company_info", "TEXT"),
+    ("receiver_info", "TEXT"),
+    ("blacklist_matches", "TEXT"),
+    ("status", "TEXT DEFAULT 'processing'"),
+    ("sender_name_key", "TEXT"),
+    ("sender_phonetic_key", "TEXT"),
+    ("receiver_name_key", "TEXT"),
+    ("receiver_phonetic_key", "TEXT"),
+]
+
+# Indexed columns of every partition
+INDEXED_COLUMNS = [
+    "transaction_date", "transaction_reference",
+    "sender_name_key", "sender_phonetic_key", "receiver_name_key", "receiver_phonetic_key",
+]
+
+MONTH_PATTERN = re.compile(r'^\d{4}_\d{2}$')
+
+
+class PartitionError(Exception):
+    """Raised for unknown partitions or partitions in the wrong state."""
+
+
+def ensure_column(cursor, table, column, column_type):
+    """Add a column to an existing table created by an older version of the schema."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def partition_for(transaction_date):
+    """Month partition ('YYYY_MM') for an ISO transaction date; undated messages go to the current month."""
+    if transaction_date and re.match(r'^\d{4}-\d{2}', transaction_date):
+        return transaction_date[:4] + "_" + transaction_date[5:7]
+    return datetime.now().strftime("%Y_%m")
+
+
+def partition_table(month):
+    if not MONTH_PATTERN.match(month or ""):
+        raise PartitionError(f"Invalid partition name: {month!r} (expected YYYY_MM)")
+    return PARTITION_PREFIX + month
+
+
+def _column_names():
+    return ["id"] + [column for column, _ in MESSAGE_COLUMNS]
+
+
+def _create_partition_table(cursor, table, schema="main"):
+    columns_sql = ",\n        ".join(f"{column} {column_type}" for column, column_type in MESSAGE_COLUMNS)
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {schema}.{table} (
+        id INTEGER PRIMARY KEY,
+        {columns_sql}
+    )
+    ''')
+    _create_partition_indexes(cursor, table, schema)
+
+
+def _create_partition_indexes(cursor, table, schema="main"):
+    for column in INDEXED_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{column} ON {table} ({column})")
+
+
+def hot_partitions(cursor):
+    cursor.execute("SELECT partition FROM message_partitions WHERE state = 'hot' ORDER BY partition")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_view(cursor):
+    """Recreate the swift_messages view as a UNION ALL over the hot partitions."""
+    columns = ", ".join(_column_names())
+    selects = [f"SELECT {columns} FROM {partition_table(month)}" for month in hot_partitions(cursor)]
+    if not selects:
+        selects = ["SELECT " + ", ".join(f"NULL AS {column}" for column in _column_names()) + " WHERE 0"]
+    cursor.execute("DROP VIEW IF EXISTS swift_messages")
+    cursor.execute("CREATE VIEW swift_messages AS " + " UNION ALL ".join(selects))
+
+
+def initialize_partitions(cursor):
+    """Create the partition catalogue and message index, migrating a legacy swift_messages table."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS message_partitions (
+        partition TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        row_count INTEGER DEFAULT 0,
+        archive_path TEXT,
+        updated_at TEXT
+    )
+    ''')
+    # Global id sequence and routing from id / reference to the owning partition
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS message_index (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_reference TEXT,
+        partition TEXT NOT NULL
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_message_index_reference ON message_index (transaction_reference)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_message_index_partition ON message_index (partition)")
+
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'swift_messages'")
+    row = cursor.fetchone()
+    if row and row[0] == 'table':
+        _migrate_legacy_table(cursor)
+
+    for month in hot_partitions(cursor):
+        for column, column_type in MESSAGE_COLUMNS:
+            ensure_column(cursor, partition_table(month), column, column_type)
+        _create_partition_indexes(cursor, partition_table(month))
+    rebuild_view(cursor)
+    # Archives of months restored on demand by an ingest or update transaction
+    _discard_restored_archives(cursor)
+
+
+def _migrate_legacy_table(cursor):
+    print("Migrating swift_messages table to monthly partitions...")
+    for column, column_type in MESSAGE_COLUMNS:
+        ensure_column(cursor, "swift_messages", column, column_type)
+
+    cursor.execute("SELECT DISTINCT transaction_date FROM swift_messages")
+    months = {partition_for(date) for (date,) in cursor.fetchall()}
+    columns = ", ".join(_column_names())
+    for month in sorted(months):
+        _register_partition(cursor, month)
+        match_sql = ("substr(transaction_date, 1, 7) = ?", (month.replace("_", "-"),))
+        if month == partition_for(None):
+            # Undated rows were routed to the current month
+            match_sql = ("(substr(transaction_date, 1, 7) = ? OR transaction_date IS NULL "
+                         "OR transaction_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*')", match_sql[1])
+        cursor.execute(f"INSERT INTO {partition_table(month)} ({columns}) SELECT {columns} FROM swift_messages WHERE {match_sql[0]}", match_sql[1])
+        cursor.execute(f"INSERT INTO message_index (id, transaction_reference, partition) SELECT id, transaction_reference, ? FROM swift_messages WHERE {match_sql[0]}", (month, *match_sql[1]))
+    cursor.execute("DROP TABLE swift_messages")
+    print(f"Migrated swift_messages into {len(months)} partitions.")
+
+
+def _register_partition(cursor, month):
+    _create_partition_table(cursor, partition_table(month))
+    cursor.execute(
+        "INSERT OR REPLACE INTO message_partitions (partition, state, updated_at) VALUES (?, 'hot', ?)",
+        (month, datetime.now().isoformat())
+    )
+
+
+def ensure_partition(cursor, month):
+    """Make sure the month is hot, creating it or restoring it from its archive.
+
+    Runs inside the caller's transaction and never commits it, so a restore
+    is kept or rolled back together with the write that needed it.
+    """
+    cursor.execute("SELECT state FROM message_partitions WHERE partition = ?", (month,))
+    row = cursor.fetchone()
+    if row and row[0] == 'hot':
+        return
+    if row and row[0] == 'archived':
+        print(f"Partition {month} is archived; restoring it for a write to one of its messages.")
+        _restore(cursor, month)
+        return
+    _register_partition(cursor, month)
+    rebuild_view(cursor)
+
+
+def archived_partitions(cursor, date_from=None, date_to=None):
+    """Archived months overlapping the date range; their messages are missing from swift_messages."""
+    first = partition_for(date_from) if date_from else None
+    last = partition_for(date_to) if date_to else None
+    cursor.execute("SELECT partition FROM message_partitions WHERE state = 'archived' ORDER BY partition")
+    return [month for (month,) in cursor.fetchall()
+            if (first is None or month >= first) and (last is None or month <= last)]
+
+
+def reference_exists(cursor, transaction_reference):
+    cursor.execute("SELECT 1 FROM message_index WHERE transaction_reference = ? LIMIT 1", (transaction_reference,))
+    return cursor.fetchone() is not None
+
+
+def insert_message(cursor, values):
+    """Insert a message into the partition of its transaction date and return its id.
+
+    An id in values is kept (AUTOINCREMENT then continues above it); otherwise the next one is assigned.
+    """
+    month = partition_for(values.get("transaction_date"))
+    ensure_partition(cursor, month)
+    cursor.execute(
+        "INSERT INTO message_index (id, transaction_reference, partition) VALUES (?, ?, ?)",
+        (values.get("id"), values.get("transaction_reference"), month)
+    )
+    message_id = cursor.lastrowid
+    columns = [column for column, _ in MESSAGE_COLUMNS if column in values]
+    cursor.execute(
+        f"INSERT INTO {partition_table(month)} (id, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+        [message_id] + [values[column] for column in columns]
+    )
+    return message_id
+
+
+def _locate(cursor, where, params):
+    """(id, partition) of the matching messages; archived months holding one are restored first."""
+    cursor.execute(f"SELECT id, partition FROM message_index WHERE {where}", params)
+    located = cursor.fetchall()
+    for month in sorted({month for _, month in located}):
+        ensure_partition(cursor, month)
+    return located
+
+
+def update_messages(cursor, values, message_id=None, transaction_reference=None):
+    """Update messages by id or reference, restoring archived months; returns the number of rows changed."""
+    where, params = ("id = ?", (message_id,)) if message_id is not None else ("transaction_reference = ?", (transaction_reference,))
+    assignments = ", ".join(f"{column} = ?" for column in values)
+    updated = 0
+    for located_id, month in _locate(cursor, where, params):
+        cursor.execute(f"UPDATE {partition_table(month)} SET {assignments} WHERE id = ?", (*values.values(), located_id))
+        updated += cursor.rowcount
+    return updated
+
+
+def delete_message(cursor, message_id):
+    deleted = 0
+    for located_id, month in _locate(cursor, "id = ?", (message_id,)):
+        cursor.execute(f"DELETE FROM {partition_table(month)} WHERE id = ?", (located_id,))
+        cursor.execute("DELETE FROM message_index WHERE id = ?", (located_id,))
+        deleted += cursor.rowcount
+    return deleted
+
+
+def messages_source(cursor, date_from=None, date_to=None):
+    """FROM-clause source covering only the hot partitions that overlap the date range."""
+    if not date_from and not date_to:
+        return "swift_messages"
+    first = partition_for(date_from) if date_from else None
+    last = partition_for(date_to) if date_to else None
+    months = [month for month in hot_partitions(cursor)
+              if (first is None or month >= first) and (last is None or month <= last)]
+    columns = ", ".join(_column_names())
+    if not months:
+        return "(SELECT " + ", ".join(f"NULL AS {column}" for column in _column_names()) + " WHERE 0)"
+    return "(" + " UNION ALL ".join(f"SELECT {columns} FROM {partition_table(month)}" for month in months) + ")"
+
+
+def list_partitions():
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("SELECT * FROM message_partitions ORDER BY partition").fetchall()
+        partitions = []
+        for row in rows:
+            partition = dict(row)
+            if row["state"] == 'hot':
+                partition["row_count"] = conn.execute(f"SELECT COUNT(*) FROM {partition_table(row['partition'])}").fetchone()[0]
+            partitions.append(partition)
+        return partitions
+    finally:
+        conn.close()
+
+
+def _compress_archive(archive_db):
+    """Gzip an archive database next to itself and remove the uncompressed file."""
+    archive_file = archive_db + ".gz"
+    with open(archive_db, 'rb') as source, gzip.open(archive_file + ".tmp", 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.replace(archive_file + ".tmp", archive_file)
+    os.chmod(archive_file, 0o444)
+    os.remove(archive_db)
+    return archive_file
+
+
+def archive_partition(month):
+    """Move a hot month into a gzip-compressed, read-only SQLite file and drop it from the live database.
+
+    The copy, the DROP and the catalogue update run under one write lock on the
+    live database, so a message arriving for that month either lands in the
+    archive or waits for the lock and then restores the month; compression
+    happens after the lock is released.
+    """
+    table = partition_table(month)
+    os.makedirs(ARCHIVE_PATH, exist_ok=True)
+    archive_db = os.path.join(ARCHIVE_PATH, f"{table}.db")
+    archive_file = archive_db + ".gz"
+
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("SELECT state FROM message_partitions WHERE partition = ?", (month,))
+            row = cursor.fetchone()
+            if not row or row[0] != 'hot':
+                raise PartitionError(f"Partition {month} is not hot")
+
+            # Leftover of an interrupted run; the live table is still complete
+            if os.path.exists(archive_db):
+                os.remove(archive_db)
+            archive_conn = sqlite3.connect(archive_db)
+            try:
+                _create_partition_table(archive_conn.cursor(), table)
+                columns = _column_names()
+                source = cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                row_count = 0
+                while True:
+                    rows = source.fetchmany(ARCHIVE_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    archive_conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+                    )
+                    row_count += len(rows)
+                # Durable before the live copy goes away
+                archive_conn.commit()
+            finally:
+                archive_conn.close()
+
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(
+                "UPDATE message_partitions SET state = 'archived', row_count = ?, archive_path = ?, updated_at = ? WHERE partition = ?",
+                (row_count, archive_file, datetime.now().isoformat(), month)
+            )
+            rebuild_view(cursor)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    _compress_archive(archive_db)
+    print(f"Archived partition {month} ({row_count} rows) to {archive_file}")
+    return {"partition": month, "row_count": row_count, "archive_path": archive_file}
+
+
+def _restore(cursor, month):
+    """Copy an archived month back into the live database within the cursor's open transaction.
+
+    The archive file stays in place, still named by archive_path, until the
+    restore is committed: a rolled-back restore leaves the month archived and
+    its archive intact. _discard_restored_archives removes it afterwards.
+    """
+    table = partition_table(month)
+    cursor.execute("SELECT state, archive_path FROM message_partitions WHERE partition = ?", (month,))
+    row = cursor.fetchone()
+    if not row or row[0] != 'archived':
+        raise PartitionError(f"Partition {month} is not archived")
+
+    if not os.path.exists(row[1]) and os.path.exists(row[1][:-len(".gz")]):
+        # Archiving was interrupted after the commit but before compression finished
+        _compress_archive(row[1][:-len(".gz")])
+    # Decompressed under its own name so it never clashes with an archive being written
+    archive_db = row[1][:-len(".gz")] + ".restore"
+    with gzip.open(row[1], 'rb') as source, open(archive_db, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    try:
+        # Read through a connection of its own: ATTACH is not allowed inside the caller's transaction
+        archive_conn = sqlite3.connect(archive_db)
+        try:
+            _create_partition_table(cursor, table)
+            columns = _column_names()
+            source = archive_conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+            row_count = 0
+            while True:
+                rows = source.fetchmany(ARCHIVE_CHUNK_SIZE)
+                if not rows:
+                    break
+                cursor.executemany(f"INSERT INTO main.{table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+                row_count += len(rows)
+        finally:
+            archive_conn.close()
+        cursor.execute(
+            "UPDATE message_partitions SET state = 'hot', row_count = ?, updated_at = ? WHERE partition = ?",
+            (row_count, datetime.now().isoformat(), month)
+        )
+        rebuild_view(cursor)
+    finally:
+        os.remove(archive_db)
+
+    print(f"Restored partition {month} ({row_count} rows)")
+    return {"partition": month, "row_count": row_count}
+
+
+def _discard_restored_archives(cursor):
+    """Remove the archive files of months whose restore has been committed."""
+    cursor.execute("SELECT partition, archive_path FROM message_partitions WHERE state = 'hot' AND archive_path IS NOT NULL")
+    for month, archive_file in cursor.fetchall():
+        if os.path.exists(archive_file):
+            os.chmod(archive_file, 0o644)
+            os.remove(archive_file)
+        cursor.execute("UPDATE message_partitions SET archive_path = NULL WHERE partition = ?", (month,))
+
+
+def restore_partition(month):
+    """Load an archived month back into the live database."""
+    partition_table(month)
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.cursor()
+        restored = _restore(cursor, month)
+        conn.commit()
+        _discard_restored_archives(cursor)
+        conn.commit()
+        return restored
+    finally:
+        conn.close()
+
+
+def drop_partition(month):
+    """Remove a month entirely (retention): its table or archive file and its index rows."""
+    table = partition_table(month)
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT state, archive_path FROM message_partitions WHERE partition = ?", (month,))
+        row = cursor.fetchone()
+        if not row:
+            raise PartitionError(f"Unknown partition {month}")
+        if row[0] == 'hot':
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        # A hot month can still name the archive it was restored from
+        if row[1] and os.path.exists(row[1]):
+            os.chmod(row[1], 0o644)
+            os.remove(row[1])
+        cursor.execute("DELETE FROM message_index WHERE partition = ?", (month,))
+        cursor.execute("DELETE FROM message_partitions WHERE partition = ?", (month,))
+        rebuild_view(cursor)
+        conn.commit()
+        print(f"Dropped partition {month}")
+        return {"partition": month}
+    finally:
+        conn.close()
+
+
+def _months_before(keep_months):
+    """First month that is still inside a window of keep_months months ending with the current one."""
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1 - (keep_months - 1)
+    return f"{index // 12:04d}_{index % 12 + 1:02d}"
+
+
+def archive_closed_partitions(hot_months=HOT_MONTHS):
+    cutoff = _months_before(hot_months)
+    return [archive_partition(p["partition"]) for p in list_partitions()
+            if p["state"] == 'hot' and p["partition"] < cutoff]
+
+
+def apply_retention(keep_months):
+    cutoff = _months_before(keep_months)
+    return [drop_partition(p["partition"]) for p in list_partitions() if p["partition"] < cutoff]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage monthly swift_messages partitions.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List partitions and their state")
+    for command in ("archive", "restore", "drop"):
+        subparsers.add_parser(command, help=f"{command.capitalize()} one month").add_argument("month", help="YYYY_MM")
+    closed = subparsers.add_parser("archive-closed", help="Archive every month older than the hot window")
+    closed.add_argument("--hot-months", type=int, default=HOT_MONTHS)
+    retain = subparsers.add_parser("retain", help="Drop every month older than the retention window")
+    retain.add_argument("--months", type=int, required=True)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    initialize_partitions(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    try:
+        if args.command == "list":
+            for partition in list_partitions():
+                print(f"{partition['partition']}\t{partition['state']}\t{partition['row_count']}\t{partition['archive_path'] or ''}")
+        elif args.command == "archive":
+            archive_partition(args.month)
+        elif args.command == "restore":
+            restore_partition(args.month)
+        elif args.command == "drop":
+            drop_partition(args.month)
+        elif args.command == "archive-closed":
+            archive_closed_partitions(args.hot_months)
+        elif args.command == "retain":
+            apply_retention(args.months)
+    except PartitionError as e:
+        parser.exit(1, f"Error: {e}\n")
@@ -0,0 +1,195 @@
+import json
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify
+
+try:
+    from .messageStore import get_message_store
+except ImportError:
+    from messageStore import get_message_store
+
+payment_flags_api = Blueprint('payment_flags_api', __name__)
+
+DATABASE_PATH = 'swift_messages.db'
+
+DEFAULT_LIMITS = {
+    "window_days": 7,            # Rolling window for count and sum, in transaction days
+    "duplicate_window_days": 1,  # Same amount again within this many days is a likely resend
+    "max_count": 5,              # Payments per counterparty pair and currency within the window
+    # Rolling sum per currency; only flagged when each payment on its own stays below it
+    "max_total": {"USD": 10000, "EUR": 10000, "GBP": 8000, "RUB": 1000000, "UZS": 120000000},
+}
+STALE_KEY_SWEEP_INTERVAL = 1000  # Observations between sweeps of counterparty pairs outside the window
+# Message columns returned alongside each flag
+FLAG_MESSAGE_COLUMNS = ["transaction_reference", "sender_name", "receiver_name", "transaction_currency", "transaction_amount"]
+
+
+def initialize_payment_flag_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS payment_flags (
+        message_id INTEGER NOT NULL,
+        flag TEXT NOT NULL,
+        details TEXT,
+        created_at TEXT,
+        PRIMARY KEY (message_id, flag)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_payment_flags_flag ON payment_flags (flag, created_at)')
+
+
+def _party_id(parsed_data, role):
+    return (parsed_data.get(f"{role}_inn") or parsed_data.get(f"{role}_account") or "").strip() or None
+
+
+def pair_key(parsed_data):
+    """(sender INN/account, receiver INN/account, currency), or None when a party cannot be identified."""
+    sender, receiver = _party_id(parsed_data, "sender"), _party_id(parsed_data, "receiver")
+    currency = (parsed_data.get("transaction_currency") or "").upper()
+    if not sender or not receiver or not currency:
+        return None
+    return sender, receiver, currency
+
+
+def _day_number(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().toordinal()
+    except (TypeError, ValueError):
+        return date.today().toordinal()
+
+
+def _amount(value):
+    try:
+        return round(float(str(value).replace(',', '.')), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+class PaymentPatternDetector:
+    """Sliding-window aggregates per counterparty pair, kept in memory.
+
+    Each pair holds one bucket per transaction day with the count, sum and
+    amounts of its payments, so observing a message touches at most
+    window_days buckets regardless of how much history the pair has.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.buckets = {}  # pair key -> {day number: [count, total, Counter(amounts)]}
+        self.latest_day = {}
+        self.observed = 0
+        self.lock = threading.Lock()
+
+    def rebuild(self, store):
+        """Reload the aggregates from the messages inside the window of the newest stored day."""
+        newest = store.latest_transaction_date()
+        messages = []
+        if newest:
+            window_start = date.fromordinal(_day_number(newest) - self.limits["window_days"] + 1).isoformat()
+            columns = ["sender_inn", "sender_account", "receiver_inn", "receiver_account",
+                       "transaction_currency", "transaction_amount", "transaction_date"]
+            for names, rows in store.iter_message_chunks({"dateFrom": window_start}, columns=columns):
+                messages.extend(dict(zip(names, row)) for row in rows)
+
+        with self.lock:
+            self.buckets, self.latest_day = {}, {}
+            return sum(1 for message in messages if self._add(message) is not None)
+
+    def _add(self, parsed_data):
+        key = pair_key(parsed_data)
+        amount = _amount(parsed_data.get("transaction_amount"))
+        if key is None or amount is None:
+            return None
+        day = _day_number(parsed_data.get("transaction_date"))
+        buckets = self.buckets.setdefault(key, {})
+        bucket = buckets.setdefault(day, [0, 0.0, Counter()])
+        bucket[0] += 1
+        bucket[1] += amount
+        bucket[2][amount] += 1
+
+        latest = max(self.latest_day.get(key, day), day)
+        self.latest_day[key] = latest
+        for old_day in [d for d in buckets if d <= latest - self.limits["window_days"]]:
+            del buckets[old_day]
+        return key, day, amount
+
+    def _window(self, key, day, days):
+        buckets = self.buckets.get(key, {})
+        return [buckets[d] for d in range(day - days + 1, day + 1) if d in buckets]
+
+    def _sweep_stale_keys(self):
+        newest = max(self.latest_day.values(), default=0)
+        for key in [k for k, latest in self.latest_day.items() if latest <= newest - self.limits["window_days"]]:
+            del self.buckets[key]
+            del self.latest_day[key]
+
+    def observe(self, parsed_data):
+        """Add a message to the aggregates and return the flags it raises."""
+        with self.lock:
+            added = self._add(parsed_data)
+            self.observed += 1
+            if self.observed % STALE_KEY_SWEEP_INTERVAL == 0:
+                self._sweep_stale_keys()
+            if added is None:
+                return []
+            key, day, amount = added
+
+            flags = []
+            recent = self._window(key, day, self.limits["duplicate_window_days"])
+            # The message itself is already counted once
+            same_amount = sum(bucket[2][amount] for bucket in recent) - 1
+            if same_amount > 0:
+                flags.append({"flag": "possible_duplicate", "amount": amount, "previous": same_amount,
+                              "window_days": self.limits["duplicate_window_days"]})
+
+            window = self._window(key, day, self.limits["window_days"])
+            count = sum(bucket[0] for bucket in window)
+            total = round(sum(bucket[1] for bucket in window), 2)
+            if count >= self.limits["max_count"]:
+                flags.append({"flag": "rolling_count", "count": count, "limit": self.limits["max_count"],
+                              "window_days": self.limits["window_days"]})
+            max_total = self.limits["max_total"].get(key[2])
+            if max_total is not None and total >= max_total and amount < max_total:
+                flags.append({"flag": "structuring", "total": total, "limit": max_total, "count": count,
+                              "window_days": self.limits["window_days"]})
+            return flags
+
+
+def store_flags(cursor, message_id, flags):
+    created_at = datetime.now().isoformat()
+    cursor.executemany(
+        "INSERT OR REPLACE INTO payment_flags (message_id, flag, details, created_at) VALUES (?, ?, ?, ?)",
+        [(message_id, flag["flag"], json.dumps(flag), created_at) for flag in flags]
+    )
+
+
+@payment_flags_api.route('/api/payment-flags', methods=['GET'])
+def api_list_payment_flags():
+    clauses, params = [], []
+    if request.args.get("flag"):
+        clauses.append("f.flag = ?")
+        params.append(request.args["flag"])
+    if request.args.get("messageId"):
+        clauses.append("f.message_id = ?")
+        params.append(request.args["messageId"])
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    limit = request.args.get("limit", 100, type=int)
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            f"SELECT f.message_id, f.flag, f.details, f.created_at FROM payment_flags f {where} ORDER BY f.created_at DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    finally:
+        conn.close()
+    # Messages may live in another backend than the flags, so they are looked up through the store
+    messages = get_message_store().messages_by_id([row["message_id"] for row in rows], columns=FLAG_MESSAGE_COLUMNS)
+    flags = []
+    for row in rows:
+        message = messages.get(row["message_id"], {})
+        flags.append({**dict(row), **{column: message.get(column) for column in FLAG_MESSAGE_COLUMNS},
+                      "details": json.loads(row["details"]) if row["details"] else {}})
+    return jsonify(flags)
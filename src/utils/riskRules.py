@@ -0,0 +1,440 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+
+try:
+    from .messageStore import get_message_store, configure_message_store
+    from .blacklistStore import check_inn, initialize_blacklist_tables
+    from .screeningCache import screening_cache, initialize_screening_cache_tables
+except ImportError:
+    from messageStore import get_message_store, configure_message_store
+    from blacklistStore import check_inn, initialize_blacklist_tables
+    from screeningCache import screening_cache, initialize_screening_cache_tables
+
+risk_api = Blueprint('risk_api', __name__)
+
+DATABASE_PATH = 'swift_messages.db'
+EVALUATION_CHUNK_SIZE = 5000  # Rows loaded into per-column lists per batch
+
+# Columns read from swift_messages for rule evaluation
+SOURCE_COLUMNS = [
+    "id", "transaction_currency", "transaction_amount", "sender_inn", "receiver_inn",
+    "sender_name", "receiver_name", "sender_bank_code", "receiver_bank_code",
+    "company_info", "receiver_info", "blacklist_matches",
+]
+
+DEFAULT_RULES = [
+    {"id": "large_amount", "type": "amount_threshold", "score": 30,
+     "currency_limits": {"USD": 10000, "EUR": 10000, "GBP": 8000, "RUB": 1000000, "UZS": 120000000}},
+    {"id": "high_risk_jurisdiction", "type": "jurisdiction", "score": 40,
+     # FATF "call for action" and selected increased-monitoring jurisdictions
+     "jurisdictions": ["KP", "IR", "MM", "SY", "YE", "SS", "North Korea", "Iran", "Myanmar", "Syria"]},
+    {"id": "screening_hit", "type": "screening_hit", "score": 100, "min_score": 0.8},
+    {"id": "deep_ownership", "type": "ownership_depth", "score": 20, "max_depth": 2},
+    {"id": "missing_inn", "type": "missing_inn", "score": 10, "parties": ["sender", "receiver"]},
+]
+
+
+class RuleError(Exception):
+    """Raised when a rule definition cannot be compiled."""
+
+
+def initialize_risk_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS risk_rule_sets (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        rules TEXT NOT NULL,
+        created_at TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS risk_scores (
+        message_id INTEGER NOT NULL,
+        rule_id TEXT NOT NULL,
+        score REAL NOT NULL,
+        rule_version INTEGER NOT NULL,
+        evaluated_at TEXT,
+        PRIMARY KEY (message_id, rule_id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_risk_scores_rule ON risk_scores (rule_id, score)')
+    cursor.execute("SELECT COUNT(*) FROM risk_rule_sets")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(
+            "INSERT INTO risk_rule_sets (rules, created_at) VALUES (?, ?)",
+            (json.dumps(DEFAULT_RULES), datetime.now().isoformat())
+        )
+
+
+# ---- Derived columns -------------------------------------------------------
+
+def _parse_json(value):
+    if not value:
+        return {}
+    if isinstance(value, (dict, list)):
+        return value
+    try:
+        return json.loads(value) or {}
+    except (TypeError, ValueError):
+        return {}
+
+
+def _parse_amount(value):
+    try:
+        return float(str(value).replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+
+
+def bank_country(code):
+    """ISO country of a BIC (positions 5-6) or of a country-prefixed national code such as RU044525068."""
+    code = (code or "").strip().upper()
+    if re.match(r'^[A-Z]{6}[A-Z0-9]{2}([A-Z0-9]{3})?$', code):
+        return code[4:6]
+    match = re.match(r'^([A-Z]{2})\d', code)
+    return match.group(1) if match else None
+
+
+def ownership_depth(details, depth=0):
+    """Length of the longest founder chain that leads through nested company details."""
+    if not isinstance(details, dict):
+        return depth
+    deepest = depth
+    for founder in details.get("Founders") or []:
+        if isinstance(founder, dict) and founder.get("companyDetails"):
+            deepest = max(deepest, ownership_depth(founder["companyDetails"], depth + 1))
+    return deepest
+
+
+def _max_hit_score(matches):
+    scores = [match.get("score", 1.0) for match in matches.values() if isinstance(match, dict)] if isinstance(matches, dict) else []
+    return max(scores, default=0.0)
+
+
+def derive_columns(columns):
+    """Turn raw swift_messages columns into the typed per-column lists the compiled rules read."""
+    company_info = [_parse_json(value) for value in columns["company_info"]]
+    receiver_info = [_parse_json(value) for value in columns["receiver_info"]]
+    return {
+        **columns,
+        "amount": [_parse_amount(value) for value in columns["transaction_amount"]],
+        "sender_country": [bank_country(code) for code in columns["sender_bank_code"]],
+        "receiver_country": [bank_country(code) for code in columns["receiver_bank_code"]],
+        "receiver_jurisdiction": [info.get("jurisdiction") if isinstance(info, dict) else None for info in receiver_info],
+        "ownership_depth": [max(ownership_depth(sender), ownership_depth(receiver))
+                            for sender, receiver in zip(company_info, receiver_info)],
+        "blacklist_score": [_max_hit_score(_parse_json(value)) for value in columns["blacklist_matches"]],
+    }
+
+
+# ---- Rule compilers ---------------------------------------------------------
+# Each compiler returns a function that scores a batch row by row over the derived column lists,
+# one score per row; plain Python loops, not vectorized array operations.
+
+def _compile_amount_threshold(rule):
+    limits_by_currency = {currency.upper(): float(limit) for currency, limit in rule["currency_limits"].items()}
+    default_limit = rule.get("default_limit")
+    score = float(rule["score"])
+
+    def evaluate(columns):
+        limits = [limits_by_currency.get((currency or "").upper(), default_limit) for currency in columns["transaction_currency"]]
+        return [score if amount is not None and limit is not None and amount >= limit else 0.0
+                for amount, limit in zip(columns["amount"], limits)]
+    return evaluate
+
+
+def _compile_jurisdiction(rule):
+    jurisdictions = {jurisdiction.upper() for jurisdiction in rule["jurisdictions"]}
+    score = float(rule["score"])
+
+    def evaluate(columns):
+        return [score if {(value or "").upper() for value in values} & jurisdictions else 0.0
+                for values in zip(columns["sender_country"], columns["receiver_country"], columns["receiver_jurisdiction"])]
+    return evaluate
+
+
+def _compile_screening_hit(rule):
+    min_score = float(rule.get("min_score", 0.8))
+    score = float(rule["score"])
+    sdn_lookup = _sdn_key_lookup() if rule.get("include_sdn", True) else None
+
+    def evaluate(columns):
+        hits = list(columns["blacklist_score"])
+        if sdn_lookup:
+            hits = [max(hit, sdn_lookup(sender), sdn_lookup(receiver))
+                    for hit, sender, receiver in zip(hits, columns["sender_name"], columns["receiver_name"])]
+        # Scaled by the strength of the hit, so a 0.9 fuzzy match scores less than an exact one
+        return [score * hit if hit >= min_score else 0.0 for hit in hits]
+    return evaluate
+
+
+def _compile_ownership_depth(rule):
+    max_depth = int(rule["max_depth"])
+    score = float(rule["score"])
+
+    def evaluate(columns):
+        return [score if depth > max_depth else 0.0 for depth in columns["ownership_depth"]]
+    return evaluate
+
+
+def _compile_missing_inn(rule):
+    parties = rule.get("parties", ["sender", "receiver"])
+    score = float(rule["score"])
+
+    def evaluate(columns):
+        missing = zip(*[[not (inn or "").strip() for inn in columns[f"{party}_inn"]] for party in parties])
+        return [score if any(flags) else 0.0 for flags in missing]
+    return evaluate
+
+
+RULE_COMPILERS = {
+    "amount_threshold": _compile_amount_threshold,
+    "jurisdiction": _compile_jurisdiction,
+    "screening_hit": _compile_screening_hit,
+    "ownership_depth": _compile_ownership_depth,
+    "missing_inn": _compile_missing_inn,
+}
+
+
+def _sdn_key_lookup():
+    """Exact key and confirmed phonetic SDN lookup, or None when no SDN cache is available."""
+    try:
+        try:
+            from .sdnLookup import get_sdn_key_index, phonetic_sdn_candidates
+            from .nameKeys import compute_name_keys
+        except ImportError:
+            from sdnLookup import get_sdn_key_index, phonetic_sdn_candidates
+            from nameKeys import compute_name_keys
+        # Never trigger an SDN download from rule evaluation
+        index = get_sdn_key_index(cached_only=True)
+        if index is None:
+            return None
+    except Exception as e:
+        print(f"SDN list unavailable for risk rules: {e}")
+        return None
+
+    def lookup(name):
+        if not name:
+            return 0.0
+        keys = compute_name_keys(name)
+        if keys["name_key"] in index["name_keys"]:
+            return 1.0
+        # Phonetic joins score their bigram similarity, and only when it reaches the SDN match threshold
+        return max((score for _, score in phonetic_sdn_candidates(keys, index)), default=0.0)
+    return lookup
+
+
+def compile_rules(rules):
+    compiled = []
+    seen = set()
+    for rule in rules:
+        if not rule.get("id") or rule["id"] in seen:
+            raise RuleError(f"Every rule needs a unique id: {rule}")
+        if rule.get("type") not in RULE_COMPILERS:
+            raise RuleError(f"Unknown rule type {rule.get('type')!r} in rule {rule['id']}")
+        try:
+            compiled.append((rule["id"], RULE_COMPILERS[rule["type"]](rule)))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise RuleError(f"Invalid rule {rule['id']}: {e}")
+        seen.add(rule["id"])
+    return compiled
+
+
+def current_rule_set(cursor):
+    cursor.execute("SELECT version, rules FROM risk_rule_sets ORDER BY version DESC LIMIT 1")
+    row = cursor.fetchone()
+    return (row[0], json.loads(row[1])) if row else (0, DEFAULT_RULES)
+
+
+# Compiled form of the newest rule set, keyed by its version and the SDN cache it looked names up in
+compiled_rules_cache = {"key": None, "compiled": None}
+compiled_rules_lock = threading.Lock()
+
+
+def _sdn_cache_mtime():
+    try:
+        try:
+            from .sdnLookup import CACHE_FILE_PATH
+        except ImportError:
+            from sdnLookup import CACHE_FILE_PATH
+        return os.path.getmtime(CACHE_FILE_PATH) if os.path.exists(CACHE_FILE_PATH) else None
+    except Exception:
+        return None
+
+
+def compiled_rule_set(cursor):
+    """(version, compiled rules) of the current rule set; compiled again only when it or the SDN list changes."""
+    cursor.execute("SELECT MAX(version) FROM risk_rule_sets")
+    key = (cursor.fetchone()[0] or 0, _sdn_cache_mtime())
+    with compiled_rules_lock:
+        if compiled_rules_cache["key"] == key:
+            return key[0], compiled_rules_cache["compiled"]
+
+    version, rules = current_rule_set(cursor)
+    compiled = compile_rules(rules)
+    with compiled_rules_lock:
+        compiled_rules_cache.update(key=(version, key[1]), compiled=compiled)
+    return version, compiled
+
+
+def evaluate_columns(compiled, columns):
+    """Scores per rule for a batch: {rule_id: [score per row]}."""
+    derived = derive_columns(columns)
+    return {rule_id: evaluate(derived) for rule_id, evaluate in compiled}
+
+
+def _store_scores(cursor, message_ids, scores, version):
+    evaluated_at = datetime.now().isoformat()
+    # Scores of rules dropped from the rule set do not survive a re-run
+    cursor.executemany(
+        "DELETE FROM risk_scores WHERE message_id = ? AND rule_version <> ?",
+        [(message_id, version) for message_id in message_ids]
+    )
+    cursor.executemany(
+        "INSERT OR REPLACE INTO risk_scores (message_id, rule_id, score, rule_version, evaluated_at) VALUES (?, ?, ?, ?, ?)",
+        [(message_id, rule_id, rule_scores[i], version, evaluated_at)
+         for rule_id, rule_scores in scores.items() for i, message_id in enumerate(message_ids)]
+    )
+
+
+def evaluate_message(cursor, message_id, parsed_data):
+    """Ingest fast path: run the current rules over one message as a batch of one and store the scores."""
+    version, compiled = compiled_rule_set(cursor)
+    columns = {column: [parsed_data.get(column)] for column in SOURCE_COLUMNS}
+    columns["id"] = [message_id]
+    scores = evaluate_columns(compiled, columns)
+    _store_scores(cursor, [message_id], scores, version)
+    return {rule_id: rule_scores[0] for rule_id, rule_scores in scores.items()}
+
+
+def rescreen_parties(columns, conn):
+    """Blacklist matches of each row against the current list, replacing those stored at ingest.
+
+    Names go through the screening cache, so a party recurring across the
+    history is matched once per blacklist version.
+    """
+    rescreened = []
+    for row in zip(columns["sender_inn"], columns["sender_name"], columns["receiver_inn"], columns["receiver_name"]):
+        matches = {}
+        for role, inn, name in (("sender", *row[:2]), ("receiver", *row[2:])):
+            match = (check_inn(inn, conn) if inn else None) or screening_cache.screen(name, conn, lists=("blacklist",))["blacklist"]
+            if match:
+                matches[role] = match
+        rescreened.append(matches)
+    return rescreened
+
+
+def evaluate_history(filters=None):
+    """Re-run the current rule set over stored messages in column batches, screening the parties again."""
+    filters = filters or {}
+    started = time.time()
+    conn = sqlite3.connect(DATABASE_PATH)
+    # The message store streams through its own connection, often to this same file; under WAL its
+    # open read no longer stops these score writes from spilling and committing
+    conn.execute("PRAGMA journal_mode=WAL")
+    cursor = conn.cursor()
+    # The screening cache commits its own writes, so it gets a connection apart from the scores
+    screening_conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        version, compiled = compiled_rule_set(cursor)
+
+        evaluated = 0
+        chunks = get_message_store().iter_message_chunks(filters, columns=SOURCE_COLUMNS, chunk_size=EVALUATION_CHUNK_SIZE)
+        for names, rows in chunks:
+            columns = {column: list(values) for column, values in zip(names, zip(*rows))}
+            # Entries added to the blacklist since ingest count against older messages too
+            columns["blacklist_matches"] = rescreen_parties(columns, screening_conn)
+            _store_scores(cursor, columns["id"], evaluate_columns(compiled, columns), version)
+            evaluated += len(rows)
+        conn.commit()
+        return {"rule_version": version, "evaluated": evaluated, "seconds": round(time.time() - started, 3)}
+    finally:
+        screening_conn.close()
+        conn.close()
+
+
+def get_message_scores(message_id):
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        rows = conn.execute(
+            "SELECT rule_id, score, rule_version FROM risk_scores WHERE message_id = ?", (message_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "message_id": message_id,
+        "total": sum(score for _, score, _ in rows),
+        "rules": {rule_id: {"score": score, "rule_version": version} for rule_id, score, version in rows},
+    }
+
+
+@risk_api.route('/api/risk-rules', methods=['GET'])
+def api_get_risk_rules():
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        version, rules = current_rule_set(conn.cursor())
+    finally:
+        conn.close()
+    return jsonify({"version": version, "rules": rules})
+
+
+@risk_api.route('/api/risk-rules', methods=['PUT'])
+def api_put_risk_rules():
+    rules = (request.json or {}).get("rules")
+    if not isinstance(rules, list):
+        return jsonify({"error": "Expected a list of rules"}), 400
+    try:
+        compile_rules(rules)
+    except RuleError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO risk_rule_sets (rules, created_at) VALUES (?, ?)",
+            (json.dumps(rules), datetime.now().isoformat())
+        )
+        conn.commit()
+        version = cursor.lastrowid
+    finally:
+        conn.close()
+    return jsonify({"version": version, "rules": rules}), 201
+
+
+@risk_api.route('/api/risk-rules/evaluate', methods=['POST'])
+def api_evaluate_risk_rules():
+    try:
+        return jsonify(evaluate_history(request.args.to_dict()))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filter value: {e}"}), 400
+
+
+@risk_api.route('/api/risk-scores/<int:message_id>', methods=['GET'])
+def api_get_risk_scores(message_id):
+    return jsonify(get_message_scores(message_id))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-run the current risk rule set over stored messages.")
+    parser.add_argument("--database", default=DATABASE_PATH, help="SQLite file holding the rule sets and scores")
+    parser.add_argument("--messages", help="Message store to score, if not the same SQLite file (path or postgresql:// URL)")
+    for name in ("dateFrom", "dateTo", "status"):
+        parser.add_argument(f"--{name}")
+    args = parser.parse_args()
+
+    DATABASE_PATH = args.database
+    configure_message_store(args.messages or args.database)
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        initialize_risk_tables(conn.cursor())
+        # Parties are screened again against the blacklist kept in the same file
+        initialize_blacklist_tables(conn.cursor())
+        initialize_screening_cache_tables(conn.cursor())
+    filters = {key: value for key, value in vars(args).items() if value is not None and key not in ("database", "messages")}
+    print(json.dumps(evaluate_history(filters)))
@@ -0,0 +1,68 @@
+import axios from 'axios';
+import type { BlacklistMatch } from '../types';
+
+const SCREENING_URL = 'http://localhost:3001/api/screening';
+
+export interface SdnEntry {
+  name: string;
+  aka_names?: string[];
+  type: string;
+  programs?: string[];
+  remarks?: string;
+  addresses?: string[];
+}
+
+export interface SdnMatch {
+  entry: SdnEntry;
+  score: number;
+  matchedBy: 'name_key' | 'phonetic_key' | 'fuzzy';
+}
+
+export interface ScreeningResult {
+  name: string;
+  isMatch: boolean;
+  blacklist: BlacklistMatch | null;
+  sdn: SdnMatch[];
+}
+
+interface QueuedScreening {
+  name: string;
+  inn?: string;
+  resolve: (result: ScreeningResult) => void;
+  reject: (error: unknown) => void;
+}
+
+// Requests in flight, so the blacklist and SDN checkers screening the same name share one
+const pending = new Map<string, Promise<ScreeningResult>>();
+// Names screened in the same turn of the event loop, sent together in one POST
+let queued: QueuedScreening[] = [];
+
+const flush = () => {
+  const batch = queued;
+  queued = [];
+  axios
+    .post<ScreeningResult[]>(SCREENING_URL, { names: batch.map(({ name, inn }) => ({ name, inn })) })
+    .then(response => batch.forEach((item, i) => item.resolve(response.data[i])))
+    .catch(error => batch.forEach(item => item.reject(error)));
+};
+
+/**
+ * Screen a name against the blacklist and the SDN list on the server, which matches on
+ * cross-script name keys, so Cyrillic and Latin spellings of a name meet. Names screened
+ * together, e.g. under one Promise.all, go to the server in a single request.
+ * @param name Name in any script.
+ * @param inn Optional INN; a blacklist match on it takes precedence over the name.
+ * @returns The blacklist match or null, and the SDN matches best first.
+ */
+export const screenName = (name: string, inn?: string): Promise<ScreeningResult> => {
+  const key = JSON.stringify([name, inn ?? null]);
+  let request = pending.get(key);
+  if (!request) {
+    request = new Promise<ScreeningResult>((resolve, reject) => {
+      if (queued.length === 0) setTimeout(flush, 0);
+      queued.push({ name, inn, resolve, reject });
+    }).finally(() => pending.delete(key));
+    pending.set(key, request);
+  }
+  return request;
+};
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from flask import Blueprint, request, jsonify
+
+try:
+    from .blacklistStore import check_inn, match_name, get_blacklist_version
+except ImportError:
+    from blacklistStore import check_inn, match_name, get_blacklist_version
+
+screening_api = Blueprint('screening_api', __name__)
+
+DATABASE_PATH = 'swift_messages.db'
+SCREENING_CACHE_MAX_ENTRIES = 100000  # Least recently used names beyond this are evicted
+EVICTION_INTERVAL = 1000  # Cache inserts between eviction passes, so the table peaks at max entries plus this
+TOUCH_INTERVAL_SECONDS = 60  # A hit only rewrites last_used once it is older than this
+# Bumped whenever the matchers change, so results cached under the old rules are invalidated like a list update
+MATCHER_VERSION = 3
+
+SCREENING_LISTS = ("blacklist", "sdn")
+SCREENING_BATCH_LIMIT = 500  # Names per POST /api/screening
+
+
+def initialize_screening_cache_tables(cursor):
+    # A NULL result column means that list has not been screened for the name under these versions yet
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS screening_cache (
+        name_key TEXT NOT NULL,
+        sdn_version TEXT NOT NULL,
+        blacklist_version INTEGER NOT NULL,
+        blacklist_result TEXT,
+        sdn_result TEXT,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (name_key, sdn_version, blacklist_version)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_screening_cache_last_used ON screening_cache (last_used)')
+
+
+def screening_key(name):
+    """Case- and whitespace-normalized name; both matchers give the same result for names sharing it."""
+    return " ".join((name or "").lower().split())
+
+
+def _sdn_matcher():
+    """(version, match function) for the SDN list; the match function is None when no SDN cache is available.
+
+    The version comes with the in-memory key index, so a lookup costs one stat of the cache file.
+    """
+    try:
+        try:
+            from .sdnLookup import get_sdn_key_index, match_sdn_name
+        except ImportError:
+            from sdnLookup import get_sdn_key_index, match_sdn_name
+        # Never trigger an SDN download or XML parse from screening
+        index = get_sdn_key_index(cached_only=True)
+    except Exception as e:
+        print(f"SDN list unavailable for screening: {e}")
+        return "unavailable", None
+    if index is None:
+        return "none", None
+    return index["version"], lambda name: match_sdn_name(name, index)
+
+
+class ScreeningCache:
+    """Screening results per normalized name, valid for one SDN and one blacklist version.
+
+    Rows of any other version pair can never be hit again, so they are deleted
+    as soon as a lookup sees the versions change; the rest is bounded by
+    evicting the least recently used names.
+    """
+
+    def __init__(self, max_entries=SCREENING_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.versions = None
+        self.inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _invalidate(self, conn, versions):
+        with self.lock:
+            if versions == self.versions:
+                return
+            self.versions = versions
+        conn.execute("DELETE FROM screening_cache WHERE sdn_version != ? OR blacklist_version != ?", versions)
+        conn.commit()
+
+    def _evict(self, conn):
+        conn.execute('''
+            DELETE FROM screening_cache WHERE rowid IN (
+                SELECT rowid FROM screening_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def screen(self, name, conn, lists=SCREENING_LISTS):
+        """Results of the requested lists for a name: the blacklist match or None, and the SDN matches."""
+        key = screening_key(name)
+        empty = {"blacklist": None, "sdn": []}
+        if not key:
+            return {list_name: empty[list_name] for list_name in lists}
+
+        sdn_version, sdn_match = _sdn_matcher()
+        versions = (f"{sdn_version}@{MATCHER_VERSION}", get_blacklist_version(conn))
+        self._invalidate(conn, versions)
+
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM screening_cache WHERE name_key = ? AND sdn_version = ? AND blacklist_version = ?",
+            (key,) + versions
+        ).fetchone()
+
+        results, missing = {}, []
+        for list_name in lists:
+            cached = row[f"{list_name}_result"] if row else None
+            if cached is None:
+                missing.append(list_name)
+            else:
+                results[list_name] = json.loads(cached)
+
+        now = time.time()
+        if not missing:
+            self.hits += 1
+            if now - row["last_used"] >= TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE screening_cache SET last_used = ? WHERE name_key = ? AND sdn_version = ? AND blacklist_version = ?",
+                    (now, key) + versions
+                )
+                conn.commit()
+            return results
+
+        self.misses += 1
+        # Matching runs on the key itself, so the stored result is exactly what any name with this key yields
+        computed = {}
+        if "blacklist" in missing:
+            computed["blacklist"] = match_name(key, conn)
+        if "sdn" in missing:
+            computed["sdn"] = sdn_match(key) if sdn_match else []
+        results.update(computed)
+
+        columns = {f"{list_name}_result": json.dumps(result, ensure_ascii=False) for list_name, result in computed.items()}
+        conn.execute(f'''
+            INSERT INTO screening_cache (name_key, sdn_version, blacklist_version, {", ".join(columns)}, last_used)
+            VALUES (?, ?, ?, {", ".join("?" * len(columns))}, ?)
+            ON CONFLICT (name_key, sdn_version, blacklist_version) DO UPDATE SET
+                {", ".join(f"{column} = excluded.{column}" for column in columns)}, last_used = excluded.last_used
+        ''', (key,) + versions + tuple(columns.values()) + (now,))
+        with self.lock:
+            self.inserts += 1
+            evict = self.inserts % EVICTION_INTERVAL == 0
+        if evict:
+            self._evict(conn)
+        conn.commit()
+        return results
+
+    def stats(self, conn):
+        entries = conn.execute("SELECT COUNT(*) FROM screening_cache").fetchone()[0]
+        return {"entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                "sdn_version": self.versions[0] if self.versions else None,
+                "blacklist_version": self.versions[1] if self.versions else None}
+
+
+screening_cache = ScreeningCache()
+
+
+def screen_parties(parsed_data):
+    """Screen sender and receiver of a parsed message against the blacklist and the SDN list.
+
+    Returns (blacklist matches, SDN matches), each by role and holding only the roles that matched.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    blacklist_matches, sdn_matches = {}, {}
+    try:
+        for role in ("sender", "receiver"):
+            results = screening_cache.screen(parsed_data.get(f"{role}_name"), conn)
+            inn = parsed_data.get(f"{role}_inn")
+            # INN matches are a single index lookup and stay uncached
+            match = (check_inn(inn, conn) if inn else None) or results["blacklist"]
+            if match:
+                blacklist_matches[role] = match
+            if results["sdn"]:
+                sdn_matches[role] = results["sdn"]
+    except sqlite3.Error as e:
+        print(f"Screening error: {e}")
+    finally:
+        conn.close()
+    return blacklist_matches, sdn_matches
+
+
+def _screen_request(name, inn, conn):
+    results = screening_cache.screen(name, conn)
+    if inn:
+        results["blacklist"] = check_inn(inn, conn) or results["blacklist"]
+    return {"name": name, "isMatch": bool(results["blacklist"] or results["sdn"]), **results}
+
+
+@screening_api.route('/api/screening', methods=['GET'])
+def api_screen_name():
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        return jsonify(_screen_request(request.args.get("name", ""), request.args.get("inn"), conn))
+    finally:
+        conn.close()
+
+
+# Several names in one request, e.g. every party, CEO and founder of a message; results keep the request order
+@screening_api.route('/api/screening', methods=['POST'])
+def api_screen_names():
+    names = (request.json or {}).get("names")
+    if not isinstance(names, list) or not all(isinstance(item, (str, dict)) for item in names):
+        return jsonify({"error": "Expected a list of names"}), 400
+    if len(names) > SCREENING_BATCH_LIMIT:
+        return jsonify({"error": f"At most {SCREENING_BATCH_LIMIT} names per request"}), 400
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        return jsonify([
+            _screen_request(item, None, conn) if isinstance(item, str) else _screen_request(item.get("name", ""), item.get("inn"), conn)
+            for item in names
+        ])
+    finally:
+        conn.close()
+
+
+@screening_api.route('/api/screening/cache', methods=['GET'])
+def api_screening_cache_stats():
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        return jsonify(screening_cache.stats(conn))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or clear the screening result cache.")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        parser.error(f"No database at {args.database}")
+    conn = sqlite3.connect(args.database)
+    try:
+        initialize_screening_cache_tables(conn.cursor())
+        if args.command == "stats":
+            entries = conn.execute("SELECT COUNT(*) FROM screening_cache").fetchone()[0]
+            versions = conn.execute("SELECT COUNT(DISTINCT sdn_version || '/' || blacklist_version) FROM screening_cache").fetchone()[0]
+            print(json.dumps({"entries": entries, "version_pairs": versions}))
+        else:
+            conn.execute("DELETE FROM screening_cache")
+            print(f"Cleared {conn.total_changes} cached screening results")
+        conn.commit()
+    finally:
+        conn.close()
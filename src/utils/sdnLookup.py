@@ -1,123 +1,176 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import xml.etree.ElementTree as ET
+import base64
+import hashlib
 import json
 import os
+import tempfile
+import threading
+from datetime import datetime
 import requests
 
+try:
+    from .httpClient import http_client, SourceUnavailable
+    from .nameKeys import compute_name_keys, bigram_similarity, phonetic_join_key, NAME_KEY_VERSION
+except ImportError:
+    from httpClient import http_client, SourceUnavailable
+    from nameKeys import compute_name_keys, bigram_similarity, phonetic_join_key, NAME_KEY_VERSION
+
 app = Flask(__name__)
 CORS(app)
 
 XML_FILE_PATH = os.path.abspath('./public/data/sdn.xml')
 CACHE_FILE_PATH = os.path.abspath('./public/data/sdn_cache.json')
+META_FILE_PATH = os.path.abspath('./public/data/sdn_meta.json')
 SDN_URL = 'https://sanctionslistservice.ofac.treas.gov/api/PublicationPreview/exports/SDN.XML'
+FUZZY_MATCH_THRESHOLD = 0.85  # Same as OfacChecker.FULL_NAME_THRESHOLD in the frontend
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
-def download_sdn_file():
-    """Downloads the SDN XML file and replaces the old file."""
+# Serializes updates so two refreshes never interleave their renames
+sdn_update_lock = threading.Lock()
+
+# In-memory key index over the cached SDN entries, rebuilt when the cache file changes
+sdn_key_index = {"mtime": None, "version": "none", "entries": [], "name_keys": {}, "phonetic_keys": {}}
+
+def load_sdn_meta():
+    """Validators and checksum of the SDN file currently in place."""
+    if os.path.exists(META_FILE_PATH):
+        with open(META_FILE_PATH, 'r') as meta_file:
+            return json.load(meta_file)
+    return {}
+
+def sdn_list_version():
+    """Identifies the SDN cache in place: its checksum, or its mtime when no metadata describes it."""
+    if not os.path.exists(CACHE_FILE_PATH):
+        return "none"
+    meta = load_sdn_meta()
+    # The metadata is written last on a swap, so a checksum older than the cache is never reported
+    if meta.get('sha256') and os.path.getmtime(META_FILE_PATH) >= os.path.getmtime(CACHE_FILE_PATH):
+        return meta['sha256']
+    return f"mtime:{os.path.getmtime(CACHE_FILE_PATH)}"
+
+def _write_atomically(path, write):
+    """Write through a temp file in the same directory, then rename it over path."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
     try:
-        # Set a timeout for the request
-        response = requests.get(SDN_URL, timeout=10)
-        response.raise_for_status()  # Check if the download was successful
+        with os.fdopen(fd, 'w') as temp_file:
+            write(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def _stream_to_temp_file(response, directory):
+    """Stream the response body to a temp file; returns (path, size, sha256, md5)."""
+    sha256, md5, size = hashlib.sha256(), hashlib.md5(), 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.sdn.xml.')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                temp_file.write(chunk)
+                sha256.update(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path, size, sha256.hexdigest(), md5.digest()
+
+def _verify_download(response, size, md5_digest):
+    expected_size = response.headers.get('Content-Length')
+    # Content-Length describes the encoded body, so it only applies to identity transfers
+    if expected_size and not response.headers.get('Content-Encoding') and int(expected_size) != size:
+        raise ValueError(f"Truncated SDN download: {size} of {expected_size} bytes")
+    content_md5 = response.headers.get('Content-MD5')
+    if content_md5 and base64.b64decode(content_md5) != md5_digest:
+        raise ValueError("SDN download does not match its Content-MD5 checksum")
+
+def download_sdn_file():
+    """Fetch SDN.XML if it changed and swap in the XML and rebuilt cache.
+
+    The request carries the stored ETag/Last-Modified, so an unchanged list costs
+    a single 304 response. A new list is streamed to a temp file, checked against
+    the advertised length and checksum, parsed, and only then renamed into place
+    with its cache; the metadata file is written last and marks the swap complete.
+    """
+    with sdn_update_lock:
+        meta = load_sdn_meta()
+        headers = {}
+        # Validators are only trusted while the files they describe are still there
+        if os.path.exists(XML_FILE_PATH) and os.path.exists(CACHE_FILE_PATH):
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
 
-        # Save the downloaded content to XML_FILE_PATH
-        with open(XML_FILE_PATH, 'wb') as file:
-            file.write(response.content)
-        print("SDN file downloaded and saved successfully.")
+        temp_path = None
+        try:
+            # Pooled client retries with backoff and fails fast while OFAC is unreachable
+            response = http_client.get(SDN_URL, timeout=(5, 60), headers=headers, stream=True)
+            with response:
+                if response.status_code == 304:
+                    print("SDN list not modified since the last download.")
+                    return {"status": "SDN list is up to date", "changed": False}
+                response.raise_for_status()  # Check if the download was successful
 
-        # Delete the cache file if it exists
-        if os.path.exists(CACHE_FILE_PATH):
-            os.remove(CACHE_FILE_PATH)
-            print("Cache file deleted successfully.")
+                directory = os.path.dirname(XML_FILE_PATH)
+                os.makedirs(directory, exist_ok=True)
+                temp_path, size, sha256, md5_digest = _stream_to_temp_file(response, directory)
+                _verify_download(response, size, md5_digest)
 
-        return {"status": "SDN list downloaded and cache cleared successfully"}
-    except requests.Timeout:
-        print("Download timed out.")
-        return {"status": "Download timed out", "error": "The download request timed out."}
-    except requests.RequestException as e:
-        print(f"Error downloading SDN file: {e}")
-        return {"status": "Error downloading SDN file", "error": str(e)}
+            new_meta = {"etag": response.headers.get('ETag'), "last_modified": response.headers.get('Last-Modified'),
+                        "sha256": sha256, "size": size}
+            if sha256 == meta.get('sha256') and os.path.exists(CACHE_FILE_PATH):
+                # Server ignored the validators but the content is the same
+                _write_atomically(META_FILE_PATH, lambda f: json.dump({**meta, **new_meta}, f))
+                print("SDN list unchanged (same checksum).")
+                return {"status": "SDN list is up to date", "changed": False}
+
+            sdn_entries, publish_date = parse_sdn_entries(temp_path)
+            if not sdn_entries:
+                raise ValueError("Downloaded SDN file contains no entries")
+
+            _write_atomically(CACHE_FILE_PATH + '.next', lambda f: json.dump(sdn_entries, f))
+            os.replace(temp_path, XML_FILE_PATH)
+            temp_path = None
+            os.replace(CACHE_FILE_PATH + '.next', CACHE_FILE_PATH)
+            _write_atomically(META_FILE_PATH, lambda f: json.dump(
+                {**new_meta, "publish_date": publish_date, "updated_at": datetime.now().isoformat()}, f))
+            print("SDN file downloaded and cache rebuilt successfully.")
+
+            return {"status": "SDN list downloaded and cache rebuilt", "changed": True,
+                    "entries_count": len(sdn_entries), "publish_date": publish_date}
+        except SourceUnavailable as e:
+            print(f"SDN source unavailable: {e}")
+            return {"status": "SDN source unavailable", "error": str(e)}
+        except requests.RequestException as e:
+            print(f"Error downloading SDN file: {e}")
+            return {"status": "Error downloading SDN file", "error": str(e)}
+        except (ValueError, ET.ParseError) as e:
+            print(f"Rejected SDN download: {e}")
+            return {"status": "Rejected SDN download", "error": str(e)}
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
 
 
 def parse_xml_to_json():
     """Parses the XML file and saves data to JSON cache."""
     try:
         print("Parsing XML file to update SDN list...")
-        
-        # Ensure the directory for the cache file exists
-        os.makedirs(os.path.dirname(CACHE_FILE_PATH), exist_ok=True)
-        
-        tree = ET.parse(XML_FILE_PATH)
-        root = tree.getroot()
-
-        namespace = ''
-        if '}' in root.tag:
-            namespace = root.tag.split('}')[0] + '}'
-
-        sdn_entries = []
-        for entry in root.findall(f".//{namespace}sdnEntry"):
-            sdn_entry = {}
-            sdn_entry['uid'] = entry.find(f"{namespace}uid").text if entry.find(f"{namespace}uid") is not None else ""
-
-            # Extract full name by combining firstName, middleName, and lastName
-            first_name = entry.find(f"{namespace}firstName").text if entry.find(f"{namespace}firstName") is not None else ""
-            middle_name = entry.find(f"{namespace}middleName").text if entry.find(f"{namespace}middleName") is not None else ""
-            last_name = entry.find(f"{namespace}lastName").text if entry.find(f"{namespace}lastName") is not None else ""
-            full_name = " ".join([first_name, middle_name, last_name]).strip()
-            sdn_entry['name'] = full_name
-
-            sdn_entry['type'] = entry.find(f"{namespace}sdnType").text if entry.find(f"{namespace}sdnType") is not None else ""
-            
-            # AKA List (Alternate Names)
-            aka_list = entry.find(f"{namespace}akaList")
-            if aka_list is not None:
-                sdn_entry['aka_names'] = [
-                    aka.find(f"{namespace}lastName").text for aka in aka_list.findall(f"{namespace}aka") 
-                    if aka.find(f"{namespace}lastName") is not None
-                ]
-
-            # Address List
-            address_list = entry.find(f"{namespace}addressList")
-            if address_list is not None:
-                addresses = []
-                for address in address_list.findall(f"{namespace}address"):
-                    city = address.find(f"{namespace}city").text if address.find(f"{namespace}city") is not None else ""
-                    country = address.find(f"{namespace}country").text if address.find(f"{namespace}country") is not None else ""
-                    addresses.append({"city": city, "country": country})
-                sdn_entry['addresses'] = addresses
-
-            # Program List (Sanctions programs)
-            program_list = entry.find(f"{namespace}programList")
-            if program_list is not None:
-                sdn_entry['programs'] = [
-                    program.text for program in program_list.findall(f"{namespace}program") if program is not None
-                ]
-
-            # Date of Birth
-            dob_feature = entry.find(f"{namespace}dateOfBirthList")
-            if dob_feature is not None:
-                dob_item = dob_feature.find(f"{namespace}dateOfBirthItem/{namespace}dateOfBirth")
-                sdn_entry['date_of_birth'] = dob_item.text if dob_item is not None else ""
-
-            # ID List with idType and idNumber
-            id_list = entry.find(f"{namespace}idList")  # Ensure lowercase 'idList' matches XML structure
-            if id_list is not None:
-                ids = []
-                for id_item in id_list.findall(f"{namespace}id"):
-                    id_type = id_item.find(f"{namespace}idType").text if id_item.find(f"{namespace}idType") is not None else ""
-                    id_number = id_item.find(f"{namespace}idNumber").text if id_item.find(f"{namespace}idNumber") is not None else ""
-                    ids.append({"id_type": id_type, "id_number": id_number})
-                sdn_entry['ids'] = ids
-
-            # Remarks
-            remarks = entry.find(f"{namespace}remarks")
-            sdn_entry['remarks'] = remarks.text if remarks is not None else ""
-
-            sdn_entries.append(sdn_entry)
-
-        # Save the data to a JSON cache file
+        sdn_entries, _ = parse_sdn_entries(XML_FILE_PATH)
+
+        # Save the data to a JSON cache file, replacing any previous cache atomically
         print("Attempting to write to JSON cache file.")
-        with open(CACHE_FILE_PATH, 'w') as cache_file:
-            json.dump(sdn_entries, cache_file)
+        _write_atomically(CACHE_FILE_PATH, lambda cache_file: json.dump(sdn_entries, cache_file))
         print("Successfully wrote to JSON cache file.")
 
         return sdn_entries
@@ -128,25 +181,182 @@ def parse_xml_to_json():
         print(f"Unexpected error: {e}")
         return []
 
-@app.route('/api/sdn-list', methods=['GET'])
-def get_sdn_list():
+def parse_sdn_entries(xml_path):
+    """Parse an SDN XML file into cache entries; returns (entries, publish date)."""
+    tree = ET.parse(xml_path)
+    root = tree.getroot()
+
+    namespace = ''
+    if '}' in root.tag:
+        namespace = root.tag.split('}')[0] + '}'
+    publish_date = root.findtext(f"{namespace}publshInformation/{namespace}Publish_Date")
+
+    sdn_entries = []
+    for entry in root.findall(f".//{namespace}sdnEntry"):
+        sdn_entry = {}
+        sdn_entry['uid'] = entry.find(f"{namespace}uid").text if entry.find(f"{namespace}uid") is not None else ""
+
+        # Extract full name by combining firstName, middleName, and lastName
+        first_name = entry.find(f"{namespace}firstName").text if entry.find(f"{namespace}firstName") is not None else ""
+        middle_name = entry.find(f"{namespace}middleName").text if entry.find(f"{namespace}middleName") is not None else ""
+        last_name = entry.find(f"{namespace}lastName").text if entry.find(f"{namespace}lastName") is not None else ""
+        full_name = " ".join([first_name, middle_name, last_name]).strip()
+        sdn_entry['name'] = full_name
+
+        sdn_entry['type'] = entry.find(f"{namespace}sdnType").text if entry.find(f"{namespace}sdnType") is not None else ""
+        
+        # AKA List (Alternate Names)
+        aka_list = entry.find(f"{namespace}akaList")
+        if aka_list is not None:
+            sdn_entry['aka_names'] = [
+                aka.find(f"{namespace}lastName").text for aka in aka_list.findall(f"{namespace}aka") 
+                if aka.find(f"{namespace}lastName") is not None
+            ]
+
+        # Address List
+        address_list = entry.find(f"{namespace}addressList")
+        if address_list is not None:
+            addresses = []
+            for address in address_list.findall(f"{namespace}address"):
+                city = address.find(f"{namespace}city").text if address.find(f"{namespace}city") is not None else ""
+                country = address.find(f"{namespace}country").text if address.find(f"{namespace}country") is not None else ""
+                addresses.append({"city": city, "country": country})
+            sdn_entry['addresses'] = addresses
+
+        # Program List (Sanctions programs)
+        program_list = entry.find(f"{namespace}programList")
+        if program_list is not None:
+            sdn_entry['programs'] = [
+                program.text for program in program_list.findall(f"{namespace}program") if program is not None
+            ]
+
+        # Date of Birth
+        dob_feature = entry.find(f"{namespace}dateOfBirthList")
+        if dob_feature is not None:
+            dob_item = dob_feature.find(f"{namespace}dateOfBirthItem/{namespace}dateOfBirth")
+            sdn_entry['date_of_birth'] = dob_item.text if dob_item is not None else ""
+
+        # ID List with idType and idNumber
+        id_list = entry.find(f"{namespace}idList")  # Ensure lowercase 'idList' matches XML structure
+        if id_list is not None:
+            ids = []
+            for id_item in id_list.findall(f"{namespace}id"):
+                id_type = id_item.find(f"{namespace}idType").text if id_item.find(f"{namespace}idType") is not None else ""
+                id_number = id_item.find(f"{namespace}idNumber").text if id_item.find(f"{namespace}idNumber") is not None else ""
+                ids.append({"id_type": id_type, "id_number": id_number})
+            sdn_entry['ids'] = ids
+
+        # Remarks
+        remarks = entry.find(f"{namespace}remarks")
+        sdn_entry['remarks'] = remarks.text if remarks is not None else ""
+
+        # Cross-script match keys for the primary name and every AKA
+        sdn_entry['match_keys'] = entry_match_keys(sdn_entry)
+        sdn_entry['key_version'] = NAME_KEY_VERSION
+
+        sdn_entries.append(sdn_entry)
+
+    return sdn_entries, publish_date
+
+def entry_match_keys(sdn_entry):
+    keys = []
+    for name in [sdn_entry.get('name')] + (sdn_entry.get('aka_names') or []):
+        if name:
+            name_keys = compute_name_keys(name)
+            if name_keys not in keys:
+                keys.append(name_keys)
+    return keys
+
+def load_sdn_entries():
     # Return cached JSON data if it exists
     if os.path.exists(CACHE_FILE_PATH):
         with open(CACHE_FILE_PATH, 'r') as cache_file:
-            sdn_entries = json.load(cache_file)
-    else:
-        sdn_entries = parse_xml_to_json()
-    return jsonify(sdn_entries)
+            return json.load(cache_file)
+    return parse_xml_to_json()
+
+def get_sdn_key_index(cached_only=False):
+    """Key index over the SDN cache, reloaded only when the cache file has changed.
+
+    With cached_only, returns None instead of parsing the XML when there is no cache.
+    """
+    try:
+        mtime = os.path.getmtime(CACHE_FILE_PATH)
+    except OSError:
+        mtime = None
+    if mtime is None and cached_only:
+        return None
+    if mtime is None or mtime != sdn_key_index["mtime"]:
+        entries = load_sdn_entries()
+        name_keys, phonetic_keys = {}, {}
+        for position, sdn_entry in enumerate(entries):
+            # Caches written before the current match keys get them recomputed here
+            if sdn_entry.get('key_version') != NAME_KEY_VERSION:
+                sdn_entry['match_keys'] = entry_match_keys(sdn_entry)
+                sdn_entry['key_version'] = NAME_KEY_VERSION
+            for keys in sdn_entry['match_keys']:
+                name_keys.setdefault(keys['name_key'], []).append(position)
+                phonetic_keys.setdefault(keys['phonetic_key'], []).append(position)
+        # The version is read once per reload, so lookups against the index never touch the metadata file
+        version = sdn_list_version() if mtime is not None else "none"
+        sdn_key_index.update(mtime=mtime, version=version, entries=entries, name_keys=name_keys, phonetic_keys=phonetic_keys)
+    return sdn_key_index
+
+def phonetic_sdn_candidates(keys, index, threshold=FUZZY_MATCH_THRESHOLD):
+    """(position, score) of entries sharing the phonetic key whose folded names also reach the threshold."""
+    phonetic_key = phonetic_join_key(keys)
+    confirmed = []
+    for position in dict.fromkeys(index['phonetic_keys'].get(phonetic_key, []) if phonetic_key else []):
+        score = max((bigram_similarity(keys['name_key'], entry_keys['name_key'])
+                     for entry_keys in index['entries'][position]['match_keys']), default=0)
+        if score >= threshold:
+            confirmed.append((position, score))
+    return confirmed
+
+def match_sdn_name(name, index=None):
+    """Match a name against the SDN list by exact key joins and confirmed phonetic joins, falling back to fuzzy scoring."""
+    keys = compute_name_keys(name)
+    if not keys['name_key']:
+        return []
+    index = index or get_sdn_key_index()
+
+    positions = index['name_keys'].get(keys['name_key'])
+    if positions:
+        return [{"entry": index['entries'][position], "score": 1.0, "matchedBy": "name_key"}
+                for position in dict.fromkeys(positions)]
+    # Phonetic keys only propose candidates; short keys collide too widely to be trusted on their own
+    confirmed = phonetic_sdn_candidates(keys, index)
+    if confirmed:
+        return [{"entry": index['entries'][position], "score": score, "matchedBy": "phonetic_key"}
+                for position, score in sorted(confirmed, key=lambda match: match[1], reverse=True)[:10]]
+
+    # Leftovers: fuzzy comparison on the folded names
+    matches = []
+    for sdn_entry in index['entries']:
+        score = max((bigram_similarity(keys['name_key'], entry_keys['name_key']) for entry_keys in sdn_entry['match_keys']), default=0)
+        if score >= FUZZY_MATCH_THRESHOLD:
+            matches.append({"entry": sdn_entry, "score": score, "matchedBy": "fuzzy"})
+    return sorted(matches, key=lambda match: match['score'], reverse=True)[:10]
+
+@app.route('/api/sdn-list', methods=['GET'])
+def get_sdn_list():
+    return jsonify(load_sdn_entries())
+
+@app.route('/api/sdn-match', methods=['GET'])
+def api_match_sdn_name():
+    name = request.args.get('name', '')
+    matches = match_sdn_name(name)
+    return jsonify({"name": name, "isMatch": bool(matches), "matches": matches})
 
 @app.route('/api/update-sdn-list', methods=['POST'])
 def update_sdn_list():
-    # Download the new XML file and delete cache, then parse XML and update JSON cache
+    # Conditional download; the XML and its rebuilt cache are swapped in together
     download_result = download_sdn_file()
     if "error" in download_result:
         return jsonify(download_result), 500
-    
-    sdn_entries = parse_xml_to_json()
-    return jsonify({"status": "SDN list updated", "entries_count": len(sdn_entries)})
+
+    if not download_result["changed"]:
+        download_result["entries_count"] = len(get_sdn_key_index()["entries"])
+    return jsonify(download_result)
 
 if __name__ == '__main__':
     app.run(debug=True)
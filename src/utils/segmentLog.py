@@ -0,0 +1,368 @@
+import argparse
+import atexit
+import glob
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # No advisory locks on Windows; a single writer has to be ensured by the deployment
+    fcntl = None
+
+SEGMENT_LOG_PATH = './parsed_log'
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # Rotate to a new segment once the current one reaches this size
+BLOCK_RECORDS = 64  # Records per compressed block; every block is one gzip member or zstd frame
+INDEX_FILE = 'index.ndjson'
+PENDING_FILE = 'pending.ndjson'  # Uncompressed, fsynced copy of the records of the block being filled
+LOCK_FILE = 'writer.lock'  # Locked with flock by the one process allowed to append
+
+COMPRESSION_SUFFIXES = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz", "none": ".ndjson"}
+
+
+def default_compression():
+    """zstd when the optional zstandard package is installed, gzip otherwise."""
+    try:
+        import zstandard  # noqa: F401
+        return "zstd"
+    except ImportError:
+        return "gzip"
+
+
+def _compress(data, compression):
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    if compression == "gzip":
+        return gzip.compress(data)
+    return data
+
+
+def _decompress(data, compression):
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if compression == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+class SegmentLogLocked(Exception):
+    """Raised when another process already has the log open for writing."""
+
+
+class SegmentLog:
+    """Append-only NDJSON log of parsed messages, split into size-rotated segments.
+
+    Records are buffered and written in blocks, each compressed on its own, so
+    the index line of a block (segment, byte offset, length, first sequence
+    number) is enough to start reading at any block without scanning the
+    segments before it. Only blocks listed in the index are considered written:
+    a block torn by a crash is truncated away when the log is reopened.
+
+    Every record is also appended and fsynced to a small pending file before
+    append returns, so records waiting for their block to fill survive a crash
+    and are taken back into the buffer on reopen.
+
+    Only one process may write: a writer holds an exclusive flock on the lock
+    file for as long as it is open, and a second writer fails with
+    SegmentLogLocked instead of flushing the first one's pending records. A
+    read-only log takes no lock and never repairs, flushes or rewrites
+    anything, so it can be opened next to the live writer.
+    """
+
+    def __init__(self, path=SEGMENT_LOG_PATH, compression=None, max_bytes=SEGMENT_MAX_BYTES, block_records=BLOCK_RECORDS,
+                 read_only=False):
+        self.path = path
+        self.compression = compression or default_compression()
+        if self.compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported segment compression: {self.compression}")
+        self.max_bytes = max_bytes
+        self.block_records = block_records
+        self.read_only = read_only
+        self.lock = threading.Lock()
+        self.pending, self.pending_file, self.lock_file = [], None, None
+        if read_only:
+            blocks = self.read_index()
+            self.next_seq = blocks[-1]["first_seq"] + blocks[-1]["records"] if blocks else 1
+            return
+
+        os.makedirs(path, exist_ok=True)
+        self.lock_file = self._lock_writer()
+        blocks = self._repair_index()
+        last = blocks[-1] if blocks else None
+        self.next_seq = last["first_seq"] + last["records"] if last else 1
+        if last and last["compression"] == self.compression:
+            self.segment = last["segment"]
+            self._truncate_torn_block(last["segment"], last["offset"] + last["length"])
+        else:
+            self.segment = self._segment_name(1 + (self._segment_number(last["segment"]) if last else 0))
+
+        self.pending = self._recover_pending()
+        if self.pending:
+            self.next_seq = self.pending[-1]["seq"] + 1
+        self.pending_file = open(os.path.join(path, PENDING_FILE), 'a', encoding='utf-8')
+
+    def _lock_writer(self):
+        lock_file = open(os.path.join(self.path, LOCK_FILE), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise SegmentLogLocked(f"The segment log in {self.path} is open for writing by another process")
+        return lock_file
+
+    def close(self):
+        """Write the partial block and release the writer lock."""
+        if self.read_only or self.lock_file is None:
+            return
+        self.flush()
+        self.pending_file.close()
+        self.lock_file.close()
+        self.lock_file = None
+
+    # ---- Index ----------------------------------------------------------------
+
+    def read_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return []
+        blocks = []
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            for line in index_file:
+                try:
+                    blocks.append(json.loads(line))
+                except ValueError:
+                    # A torn last line: its block is dropped with it
+                    break
+        return blocks
+
+    def _repair_index(self):
+        """Drop a torn last index line so later appends start on a fresh line."""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return []
+        blocks, valid_bytes = [], 0
+        with open(index_path, 'rb') as index_file:
+            for line in index_file:
+                try:
+                    blocks.append(json.loads(line))
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    blocks.pop()
+                    break
+                valid_bytes += len(line)
+        if os.path.getsize(index_path) > valid_bytes:
+            with open(index_path, 'r+b') as index_file:
+                index_file.truncate(valid_bytes)
+        return blocks
+
+    def _segment_name(self, number):
+        return f"segment-{number:06d}{COMPRESSION_SUFFIXES[self.compression]}"
+
+    @staticmethod
+    def _segment_number(segment):
+        return int(segment.split('-')[1].split('.')[0])
+
+    def _truncate_torn_block(self, segment, end):
+        segment_path = os.path.join(self.path, segment)
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) > end:
+            with open(segment_path, 'r+b') as segment_file:
+                segment_file.truncate(end)
+
+    def _read_pending(self, from_seq):
+        """(entries with seq >= from_seq, whether the file held nothing else) from the pending file."""
+        pending_path = os.path.join(self.path, PENDING_FILE)
+        if not os.path.exists(pending_path):
+            return [], True
+        entries, clean = [], True
+        with open(pending_path, 'rb') as pending_file:
+            for line in pending_file:
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    clean = False
+                    break
+                # Left over when a crash hit between writing the block and clearing the file
+                if entry["seq"] < from_seq:
+                    clean = False
+                    continue
+                entries.append(entry)
+        return entries, clean
+
+    def _recover_pending(self):
+        """Records logged but not yet in a block; rewrites the pending file without torn or already written lines."""
+        pending_path = os.path.join(self.path, PENDING_FILE)
+        entries, clean = self._read_pending(self.next_seq)
+        if not clean:
+            with open(pending_path + '.tmp', 'w', encoding='utf-8') as pending_file:
+                pending_file.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+                pending_file.flush()
+                os.fsync(pending_file.fileno())
+            os.replace(pending_path + '.tmp', pending_path)
+        return entries
+
+    # ---- Writing --------------------------------------------------------------
+
+    def append(self, record, source=None):
+        """Log one parsed message durably; returns its sequence number."""
+        if self.read_only:
+            raise ValueError("The segment log was opened read-only")
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            entry = {"seq": seq, "source": source, "logged_at": datetime.now().isoformat(), "data": record}
+            # Durable before append returns, like the per-message files this log replaced
+            self.pending_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.pending_file.flush()
+            os.fsync(self.pending_file.fileno())
+            self.pending.append(entry)
+            if len(self.pending) >= self.block_records:
+                self._write_block()
+            return seq
+
+    def flush(self):
+        if self.read_only:
+            raise ValueError("The segment log was opened read-only")
+        with self.lock:
+            self._write_block()
+
+    def _write_block(self):
+        if not self.pending:
+            return
+        payload = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.pending).encode('utf-8')
+        block = _compress(payload, self.compression)
+
+        segment_path = os.path.join(self.path, self.segment)
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.max_bytes:
+            self.segment = self._segment_name(self._segment_number(self.segment) + 1)
+            segment_path = os.path.join(self.path, self.segment)
+
+        with open(segment_path, 'ab') as segment_file:
+            offset = segment_file.tell()
+            segment_file.write(block)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+
+        entry = {"segment": self.segment, "offset": offset, "length": len(block), "first_seq": self.pending[0]["seq"],
+                 "records": len(self.pending), "compression": self.compression}
+        with open(os.path.join(self.path, INDEX_FILE), 'a', encoding='utf-8') as index_file:
+            index_file.write(json.dumps(entry) + "\n")
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        # The block is indexed, so its records no longer need the pending copy
+        self.pending_file.truncate(0)
+        self.pending = []
+
+    # ---- Reading --------------------------------------------------------------
+
+    def _pending_snapshot(self):
+        if self.read_only:
+            return self._read_pending(1)[0]
+        with self.lock:
+            return list(self.pending)
+
+    def replay(self, from_seq=1):
+        """Stream logged entries with seq >= from_seq, one block in memory at a time, then those not in a block yet.
+
+        Nothing is written. The pending records are taken before the index is
+        read, so records a writer moves into a block meanwhile are read from
+        that block, and pending copies of indexed records are skipped.
+        """
+        pending = self._pending_snapshot()
+        indexed_seq = 1
+        for block in self.read_index():
+            indexed_seq = max(indexed_seq, block["first_seq"] + block["records"])
+            if block["first_seq"] + block["records"] <= from_seq:
+                continue
+            with open(os.path.join(self.path, block["segment"]), 'rb') as segment_file:
+                segment_file.seek(block["offset"])
+                payload = _decompress(segment_file.read(block["length"]), block["compression"])
+            for line in io.TextIOWrapper(io.BytesIO(payload), encoding='utf-8'):
+                entry = json.loads(line)
+                if entry["seq"] >= from_seq:
+                    yield entry
+        for entry in pending:
+            if entry["seq"] >= max(from_seq, indexed_seq):
+                yield entry
+
+    def stats(self):
+        pending = self._pending_snapshot()
+        blocks = self.read_index()
+        segments = sorted({block["segment"] for block in blocks})
+        indexed_seq = blocks[-1]["first_seq"] + blocks[-1]["records"] if blocks else 1
+        pending = [entry for entry in pending if entry["seq"] >= indexed_seq]
+        return {
+            "segments": len(segments),
+            "records": sum(block["records"] for block in blocks) + len(pending),
+            "bytes": sum(os.path.getsize(os.path.join(self.path, segment)) for segment in segments
+                         if os.path.exists(os.path.join(self.path, segment))),
+            "next_seq": pending[-1]["seq"] + 1 if pending else indexed_seq,
+            "compression": self.compression,
+        }
+
+
+def import_legacy_json(log, directory):
+    """Append the per-message <file>.json files of the old layout to the log; the files are left in place."""
+    imported = 0
+    for json_path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(json_path, 'r', encoding='utf-8') as json_file:
+            log.append(json.load(json_file), source=os.path.basename(json_path)[:-len('.json')])
+        imported += 1
+    log.flush()
+    return imported
+
+
+# Shared log for the ingestion handlers; the partial block is compressed on exit, its records are already durable
+parsed_log = None
+
+
+def get_parsed_log():
+    """The writing log of this process; raises SegmentLogLocked when another process is writing it."""
+    global parsed_log
+    if parsed_log is None:
+        parsed_log = SegmentLog()
+        atexit.register(parsed_log.close)
+    return parsed_log
+
+
+def read_parsed_log():
+    """A read-only view of the shared log, usable from any process."""
+    return SegmentLog(read_only=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect, replay or import into the parsed-message segment log.")
+    parser.add_argument("--path", default=SEGMENT_LOG_PATH)
+    parser.add_argument("--compression", choices=COMPRESSION_SUFFIXES)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show segment and record counts")
+    replay_parser = commands.add_parser("replay", help="Write logged entries as NDJSON to stdout")
+    replay_parser.add_argument("--from-seq", type=int, default=1)
+    import_parser = commands.add_parser("import-json", help="Append legacy per-message JSON files")
+    import_parser.add_argument("directory", nargs="?", default="./public/data")
+    args = parser.parse_args()
+
+    if args.command == "import-json":
+        try:
+            log = SegmentLog(args.path, compression=args.compression)
+        except SegmentLogLocked as e:
+            parser.error(str(e))
+        print(f"Imported {import_legacy_json(log, args.directory)} files into {args.path}")
+        log.close()
+    else:
+        # Inspection never writes, so it is safe while the server is appending
+        log = SegmentLog(args.path, compression=args.compression, read_only=True)
+        if args.command == "stats":
+            print(json.dumps(log.stats()))
+        else:
+            for entry in log.replay(args.from_seq):
+                sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
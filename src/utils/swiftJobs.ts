@@ -0,0 +1,163 @@
+import axios from 'axios';
+
+const JOBS_URL = 'http://localhost:3001/api/process-swift/jobs';
+const POLL_INTERVAL_MS = 1000;
+const JOB_STREAM_GROUP_SIZE = 100; // Job ids per batch event stream
+
+export interface SwiftJobProgress {
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  stage?: string;
+}
+
+/**
+ * Submit a SWIFT message for background processing.
+ * @param message Raw MT103 text.
+ * @returns The job id; the server has already parsed the message at this point.
+ */
+export const submitSwiftJob = async (message: string): Promise<string> => {
+  const response = await axios.post(JOBS_URL, { message });
+  return response.data.job_id;
+};
+
+/**
+ * Follow a job until it finishes, using Server-Sent Events and falling back to polling.
+ * @param jobId Id returned by submitSwiftJob.
+ * @param onProgress Optional callback for intermediate progress events.
+ * @returns The parsed and enriched message.
+ */
+export const waitForSwiftJob = (
+  jobId: string,
+  onProgress?: (progress: SwiftJobProgress) => void
+): Promise<any> =>
+  new Promise((resolve, reject) => {
+    const poll = async () => {
+      try {
+        const { data } = await axios.get(`${JOBS_URL}/${jobId}`);
+        if (data.status === 'done') return resolve(data.result);
+        if (data.status === 'failed') return reject(new Error(data.error));
+        onProgress?.(data);
+        setTimeout(poll, POLL_INTERVAL_MS);
+      } catch (error) {
+        reject(error);
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+
+    const source = new EventSource(`${JOBS_URL}/${jobId}/events`);
+    source.addEventListener('progress', (event) => {
+      onProgress?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('done', (event) => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data).result);
+    });
+    source.addEventListener('failed', (event) => {
+      source.close();
+      reject(new Error(JSON.parse((event as MessageEvent).data).error));
+    });
+    source.onerror = () => {
+      // Stream dropped (proxy timeout, restart); continue by polling
+      source.close();
+      poll();
+    };
+  });
+
+export interface SubmittedSwiftJob {
+  job_id?: string;
+  transaction_reference?: string;
+  error?: string;
+}
+
+export interface SwiftJobOutcome {
+  jobId: string;
+  result?: any;
+  error?: string;
+}
+
+/**
+ * Submit several SWIFT messages in one request.
+ * @param messages Raw MT103 texts.
+ * @returns One entry per message, in order: a job id, or the parse error of that message.
+ */
+export const submitSwiftJobs = async (messages: string[]): Promise<SubmittedSwiftJob[]> => {
+  const response = await axios.post(JOBS_URL, { messages });
+  return response.data;
+};
+
+const followJobGroup = (
+  jobIds: string[],
+  finish: (outcome: SwiftJobOutcome) => void
+): Promise<void> =>
+  new Promise((resolve) => {
+    const remaining = new Set(jobIds);
+    let source: EventSource | undefined;
+
+    const settle = (outcome: SwiftJobOutcome) => {
+      if (!remaining.delete(outcome.jobId)) return;
+      finish(outcome);
+      if (!remaining.size) {
+        source?.close();
+        resolve();
+      }
+    };
+
+    const poll = async () => {
+      try {
+        const { data } = await axios.get(JOBS_URL, { params: { ids: Array.from(remaining).join(',') } });
+        data.forEach((job: any) => {
+          if (job.status === 'done') settle({ jobId: job.job_id, result: job.result });
+          if (job.status === 'failed') settle({ jobId: job.job_id, error: job.error });
+        });
+      } catch (error) {
+        console.error('Error polling SWIFT jobs:', error);
+      }
+      if (remaining.size) setTimeout(poll, POLL_INTERVAL_MS);
+    };
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+
+    source = new EventSource(`${JOBS_URL}/events?ids=${jobIds.join(',')}`);
+    source.addEventListener('done', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      settle({ jobId: data.job_id, result: data.result });
+    });
+    source.addEventListener('failed', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      settle({ jobId: data.job_id, error: data.error });
+    });
+    source.onerror = () => {
+      // Stream dropped (proxy timeout, restart); continue by polling
+      source?.close();
+      poll();
+    };
+  });
+
+/**
+ * Follow a batch of jobs with one event stream (or one polling loop) at a time.
+ * Ids are followed in groups to keep the stream URL short; the server keeps the
+ * events of finished jobs, so later groups catch up immediately.
+ * @param jobIds Ids returned by submitSwiftJobs.
+ * @param onFinished Optional callback as each job finishes, successfully or not.
+ * @returns The outcome of every job, in the order of jobIds.
+ */
+export const waitForSwiftJobs = async (
+  jobIds: string[],
+  onFinished?: (outcome: SwiftJobOutcome) => void
+): Promise<SwiftJobOutcome[]> => {
+  const outcomes = new Map<string, SwiftJobOutcome>();
+  for (let start = 0; start < jobIds.length; start += JOB_STREAM_GROUP_SIZE) {
+    await followJobGroup(jobIds.slice(start, start + JOB_STREAM_GROUP_SIZE), (outcome) => {
+      outcomes.set(outcome.jobId, outcome);
+      onFinished?.(outcome);
+    });
+  }
+  return jobIds.map(jobId => outcomes.get(jobId)!);
+};
@@ -1,10 +1,11 @@
 import sqlite3
-from flask import Blueprint, request, jsonify, Flask
+from flask import Blueprint, request, jsonify, Flask, Response
 from flask_cors import CORS
 import os
 import re
 import json
 import time
+import threading
 from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
@@ -13,53 +14,81 @@ from transliterate import translit
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+try:
+    from .httpClient import http_client, SourceUnavailable, ENRICHMENT_RETRIES, ENRICHMENT_TIMEOUT
+    from .jobQueue import JobManager
+    from .blacklistStore import blacklist_api, initialize_blacklist_tables
+    from .screeningCache import screening_api, initialize_screening_cache_tables, screen_parties
+    from .messageExport import export_api
+    from .messageStore import get_message_store, party_name_keys, StorageError
+    from .riskRules import risk_api, initialize_risk_tables, evaluate_message
+    from .paymentPatterns import payment_flags_api, initialize_payment_flag_tables, PaymentPatternDetector, store_flags
+    from .segmentLog import get_parsed_log, read_parsed_log
+    from .changeFeed import change_feed_api, attach_change_notifier
+except ImportError:
+    from httpClient import http_client, SourceUnavailable, ENRICHMENT_RETRIES, ENRICHMENT_TIMEOUT
+    from jobQueue import JobManager
+    from blacklistStore import blacklist_api, initialize_blacklist_tables
+    from screeningCache import screening_api, initialize_screening_cache_tables, screen_parties
+    from messageExport import export_api
+    from messageStore import get_message_store, party_name_keys, StorageError
+    from riskRules import risk_api, initialize_risk_tables, evaluate_message
+    from paymentPatterns import payment_flags_api, initialize_payment_flag_tables, PaymentPatternDetector, store_flags
+    from segmentLog import get_parsed_log, read_parsed_log
+    from changeFeed import change_feed_api, attach_change_notifier
+
 app = Flask(__name__)
-CORS(app)
+# The dashboard reads the change feed position of a snapshot from X-Change-Seq, and the
+# archived months its filters reach into from X-Archived-Partitions
+CORS(app, expose_headers=["X-Change-Seq", "X-Archived-Partitions"])
+app.register_blueprint(blacklist_api)
+app.register_blueprint(screening_api)
+app.register_blueprint(export_api)
+app.register_blueprint(risk_api)
+app.register_blueprint(payment_flags_api)
+app.register_blueprint(change_feed_api)
 
 # Paths
 SWIFT_FOLDER_PATH = './public/swift'
-PARSED_DATA_PATH = './public/data'
 DATABASE_PATH = 'swift_messages.db'
+REPLAY_BATCH_SIZE = 1000  # Log entries bulk-inserted per store round trip when replaying into the database
+ENRICHMENT_RETRY_INTERVAL = 300  # Seconds between background retries of deferred lookups
 
 # Ensure directories exist
 os.makedirs(SWIFT_FOLDER_PATH, exist_ok=True)
-os.makedirs(PARSED_DATA_PATH, exist_ok=True)
 
 # Parsed files data dictionary
 parsed_files = {}
 
+# Background enrichment jobs submitted through /api/process-swift/jobs
+swift_jobs = JobManager()
+
+# Rolling per-counterparty aggregates for duplicate and structuring detection
+payment_detector = PaymentPatternDetector()
+
 # Initialize Database
 def initialize_db():
+    # Messages and the enrichment queue live in the configured message store
+    message_store = get_message_store()
+    message_store.initialize()
+    # Start the change feed publisher, which commits of this process wake early
+    attach_change_notifier(message_store)
+
+    # Blacklist, screening cache, risk scores and payment flags stay in the local SQLite file,
+    # which is why a PostgreSQL message store is attached to one node only
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS swift_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        transaction_reference TEXT,
-        transaction_type TEXT,
-        transaction_date TEXT,
-        transaction_currency TEXT,
-        transaction_amount TEXT,
-        sender_account TEXT,
-        sender_inn TEXT,
-        sender_name TEXT,
-        sender_address TEXT,
-        sender_bank_code TEXT,
-        receiver_account TEXT,
-        receiver_inn TEXT,
-        receiver_name TEXT,
-        receiver_kpp TEXT,
-        receiver_bank_code TEXT,
-        receiver_bank_name TEXT,
-        transaction_purpose TEXT,
-        transaction_fees TEXT,
-        company_info TEXT,
-        receiver_info TEXT
-    )
-    ''')
+    initialize_blacklist_tables(cursor)
+    initialize_screening_cache_tables(cursor)
+    initialize_risk_tables(cursor)
+    initialize_payment_flag_tables(cursor)
     conn.commit()
     conn.close()
 
+    payment_detector.rebuild(message_store)
+    start_enrichment_retries()
+
+
 
 ENTITY_LABELS = [
     # Russian (Cyrillic and Latin)
@@ -315,7 +344,7 @@ def search_orginfo(company_name):
     
     try:
         time.sleep(RATE_LIMIT_DELAY)
-        response = requests.get(search_url, headers=headers, timeout=15)
+        response = http_client.get(search_url, headers=headers, timeout=ENRICHMENT_TIMEOUT, retries=ENRICHMENT_RETRIES)
         response.raise_for_status()  # Check if the request was successful
         print(f"Searching orginfo for {company_name}: Status {response.status_code}")
 
@@ -344,7 +373,7 @@ def fetch_company_details_orginfo(org_url):
 
     try:
         time.sleep(RATE_LIMIT_DELAY)
-        response = requests.get(org_url, headers=headers, timeout=15)
+        response = http_client.get(org_url, headers=headers, timeout=ENRICHMENT_TIMEOUT, retries=ENRICHMENT_RETRIES)
         response.raise_for_status()
         print(f"Fetching company details from {org_url}")
 
@@ -431,7 +460,7 @@ def get_company_details(inn, depth=0, processed_inns=None):
         headers = {"User-Agent": "Mozilla/5.0"}
 
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = http_client.get(url, headers=headers, timeout=ENRICHMENT_TIMEOUT, retries=ENRICHMENT_RETRIES)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
 
@@ -492,6 +521,8 @@ def get_company_details(inn, depth=0, processed_inns=None):
 
             return company_info if company_info['name'] or company_info['Founders'] else None
 
+        except SourceUnavailable:
+            raise
         except Exception as e:
             print(f"Error retrieving company data for INN {inn}: {e}")
             return None
@@ -528,48 +559,136 @@ def extract_jurisdiction(company_name):
             
     return 'Unknown'
 
-def save_to_database(parsed_data):
+def fetch_sender_details(sender_name):
+    """Look up the sender on orginfo.uz and return its company details."""
+    company_search_link = search_orginfo(sender_name)
+    if company_search_link:
+        return fetch_company_details_orginfo(company_search_link)
+    return None
+
+# Enrichment lookups keyed by the swift_messages column they fill
+ENRICHMENT_SOURCES = {
+    "company_info": fetch_sender_details,
+    "receiver_info": get_company_details,
+}
+
+# Serializes retry rounds of the background thread and /api/retry-enrichment
+enrichment_retry_lock = threading.Lock()
+# Set to run a retry round before the interval is up, e.g. when a lookup source recovers
+enrichment_retry_wakeup = threading.Event()
+enrichment_retry_thread = None
+
+def retry_pending_enrichment(limit=50):
+    """Retry queued enrichment lookups and store the results on their messages."""
+    message_store = get_message_store()
+    completed, deferred = 0, 0
+
+    with enrichment_retry_lock:
+        try:
+            for transaction_reference, field, lookup_key in message_store.pending_enrichment(limit):
+                try:
+                    details = ENRICHMENT_SOURCES[field](lookup_key)
+                except SourceUnavailable as e:
+                    message_store.defer_enrichment(transaction_reference, field, str(e))
+                    deferred += 1
+                    continue
+
+                # field comes from ENRICHMENT_SOURCES, never from user input
+                message_store.complete_enrichment(transaction_reference, field, json.dumps(details or {}))
+                completed += 1
+        except StorageError as e:
+            print(f"Database error: {e}")
+
+    return {"completed": completed, "deferred": deferred}
+
+def retry_enrichment_periodically(limit=50):
+    """Background loop draining the deferred lookups every interval and whenever a source recovers."""
+    while True:
+        enrichment_retry_wakeup.wait(ENRICHMENT_RETRY_INTERVAL)
+        enrichment_retry_wakeup.clear()
+        # Full rounds that made progress are followed by another one; a round of only deferrals waits
+        while True:
+            result = retry_pending_enrichment(limit)
+            if result["completed"] or result["deferred"]:
+                print(f"Retried deferred lookups: {result}")
+            if not result["completed"] or result["completed"] + result["deferred"] < limit:
+                break
+
+def start_enrichment_retries():
+    global enrichment_retry_thread
+    if enrichment_retry_thread is not None:
+        return
+    http_client.add_recovery_listener(lambda host: enrichment_retry_wakeup.set())
+    enrichment_retry_thread = threading.Thread(target=retry_enrichment_periodically, name="enrichment-retry", daemon=True)
+    enrichment_retry_thread.start()
+
+def message_values(parsed_data):
+    """Column values of a parsed message as the message store takes them."""
+    return {
+        "transaction_reference": parsed_data.get("transaction_reference"),
+        "transaction_type": parsed_data.get("transaction_type"),
+        "transaction_date": parsed_data.get("transaction_date"),
+        "transaction_currency": parsed_data.get("transaction_currency"),
+        "transaction_amount": parsed_data.get("transaction_amount"),
+        "sender_account": parsed_data.get("sender_account"),
+        "sender_inn": parsed_data.get("sender_inn"),
+        "sender_name": parsed_data.get("sender_name"),
+        "sender_address": parsed_data.get("sender_address"),
+        "sender_bank_code": parsed_data.get("sender_bank_code"),
+        "receiver_account": parsed_data.get("receiver_account"),
+        "receiver_inn": parsed_data.get("receiver_inn"),
+        "receiver_name": parsed_data.get("receiver_name"),
+        "receiver_kpp": parsed_data.get("receiver_kpp"),
+        "receiver_bank_code": parsed_data.get("receiver_bank_code"),
+        "receiver_bank_name": parsed_data.get("receiver_bank_name"),
+        "transaction_purpose": parsed_data.get("transaction_purpose"),
+        "transaction_fees": parsed_data.get("transaction_fees"),
+        "company_info": json.dumps(parsed_data.get("company_info", {})),  # Ensure JSON serialization of company_info
+        "receiver_info": json.dumps(parsed_data.get("receiver_info", {})),  # Ensure JSON serialization of receiver_info
+        "blacklist_matches": json.dumps(parsed_data.get("blacklist_matches", {})),
+        **party_name_keys(parsed_data),
+    }
+
+def score_saved_messages(saved):
+    """Risk scores and payment pattern flags for (message id, parsed data) pairs just stored."""
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
-    
     try:
-        # Check if a record with the same transaction_reference already exists
-        cursor.execute("SELECT 1 FROM swift_messages WHERE transaction_reference = ?", (parsed_data.get("transaction_reference"),))
-        if cursor.fetchone() is not None:
-            print(f"Transaction with reference {parsed_data.get('transaction_reference')} already exists in the database.")
-            return  # Exit the function without saving duplicate
-
-        # Proceed with insertion if no duplicate is found
-        cursor.execute('''
-            INSERT INTO swift_messages (
-                transaction_reference, transaction_type, transaction_date, transaction_currency,
-                transaction_amount, sender_account, sender_inn, sender_name, sender_address,
-                sender_bank_code, receiver_account, receiver_inn, receiver_name, receiver_kpp,
-                receiver_bank_code, receiver_bank_name, transaction_purpose, transaction_fees,
-                company_info, receiver_info
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            parsed_data.get("transaction_reference"), parsed_data.get("transaction_type"),
-            parsed_data.get("transaction_date"), parsed_data.get("transaction_currency"),
-            parsed_data.get("transaction_amount"), parsed_data.get("sender_account"),
-            parsed_data.get("sender_inn"), parsed_data.get("sender_name"),
-            parsed_data.get("sender_address"), parsed_data.get("sender_bank_code"),
-            parsed_data.get("receiver_account"), parsed_data.get("receiver_inn"),
-            parsed_data.get("receiver_name"), parsed_data.get("receiver_kpp"),
-            parsed_data.get("receiver_bank_code"), parsed_data.get("receiver_bank_name"),
-            parsed_data.get("transaction_purpose"), parsed_data.get("transaction_fees"),
-            json.dumps(parsed_data.get("company_info", {})),  # Ensure JSON serialization of company_info
-            json.dumps(parsed_data.get("receiver_info", {}))  # Ensure JSON serialization of receiver_info
-        ))
-        
+        for message_id, parsed_data in saved:
+            # Score the message against the current risk rules
+            parsed_data["risk_scores"] = evaluate_message(cursor, message_id, parsed_data)
+
+            # Near-duplicate resends and split payments between the same counterparties
+            parsed_data["payment_flags"] = payment_detector.observe(parsed_data)
+            store_flags(cursor, message_id, parsed_data["payment_flags"])
         conn.commit()
-        print(f"Transaction with reference {parsed_data.get('transaction_reference')} saved to the database.")
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
     finally:
         conn.close()
 
-def extract_mt103_data(message):
+def store_parsed_message(parsed_data):
+    """Store, score and flag a parsed message; raises StorageError or sqlite3.Error when that fails."""
+    # Known references are skipped, so re-sent files are not stored twice
+    message_id = get_message_store().save_message(
+        message_values(parsed_data),
+        parsed_data.get("pending_enrichment", [])  # Lookups skipped because their source was unavailable
+    )
+    if message_id is None:
+        print(f"Transaction with reference {parsed_data.get('transaction_reference')} already exists in the database.")
+        return  # Exit the function without saving duplicate
+    # Lets the uploader match its result to the insert the change feed delivers
+    parsed_data["id"] = message_id
+
+    score_saved_messages([(message_id, parsed_data)])
+    print(f"Transaction with reference {parsed_data.get('transaction_reference')} saved to the database.")
+
+def save_to_database(parsed_data):
+    try:
+        store_parsed_message(parsed_data)
+    except (StorageError, sqlite3.Error) as e:
+        print(f"Database error: {e}")
+
+def parse_mt103_data(message):
+    """Extract MT103 fields from the raw message without any external lookups."""
     message = message.replace('\r', '\n').replace('\n\n', '\n')
     
     transaction_date, currency, amount = extract_transaction_date_and_currency(message)
@@ -581,15 +700,7 @@ def extract_mt103_data(message):
     print(f"Receiver details: {receiver_name=}, {receiver_inn=}, {receiver_kpp=}")
     print(f"Transaction amount: {currency} {amount}")
 
-    company_info = None
-    if sender_name:
-        company_search_link = search_orginfo(sender_name)
-        if company_search_link:
-            company_info = fetch_company_details_orginfo(company_search_link)
-
-    receiver_info = get_company_details(receiver_inn) if receiver_inn else None
-
-    return {
+    parsed_data = {
         "transaction_reference": extract_transaction_reference(message),
         "transaction_type": extract_transaction_type(message),
         "transaction_date": transaction_date,
@@ -609,10 +720,33 @@ def extract_mt103_data(message):
         "receiver_kpp": receiver_kpp,
         "transaction_purpose": extract_transaction_purpose(message),
         "transaction_fees": extract_transaction_fees(message),
-        "company_info": company_info,
-        "receiver_info": receiver_info
+        "company_info": None,
+        "receiver_info": None,
+        "pending_enrichment": []
     }
 
+    # Screen both parties against the server-side blacklist and SDN list; recurring names are cache hits
+    parsed_data["blacklist_matches"], parsed_data["sdn_matches"] = screen_parties(parsed_data)
+    return parsed_data
+
+def enrich_parsed_data(parsed_data, report=None):
+    """Fill company_info and receiver_info; lookups against an unavailable source are queued instead of stalling ingestion."""
+    lookups = (("company_info", parsed_data.get("sender_name")), ("receiver_info", parsed_data.get("receiver_inn")))
+    for field, lookup_key in lookups:
+        if not lookup_key:
+            continue
+        if report:
+            report(field, lookup_key=lookup_key)
+        try:
+            parsed_data[field] = ENRICHMENT_SOURCES[field](lookup_key)
+        except SourceUnavailable as e:
+            print(f"Deferring {field} lookup for {lookup_key}: {e}")
+            parsed_data["pending_enrichment"].append({"field": field, "lookup_key": lookup_key})
+    return parsed_data
+
+def extract_mt103_data(message):
+    return enrich_parsed_data(parse_mt103_data(message))
+
 # Process a single SWIFT message file
 def process_swift_message(file_path):
     # Attempt to open the file, retrying if necessary
@@ -637,10 +771,8 @@ class SwiftFileHandler(FileSystemEventHandler):
             file_name = os.path.basename(event.src_path)
             parsed_files[file_name] = parsed_data
 
-            # Save parsed data to JSON file
-            parsed_data_path = os.path.join(PARSED_DATA_PATH, f"{file_name}.json")
-            with open(parsed_data_path, 'w') as json_file:
-                json.dump(parsed_data, json_file)
+            # Keep the raw parse output for audit in the segment log
+            get_parsed_log().append(parsed_data, source=file_name)
 
             # Save parsed data to the database
             save_to_database(parsed_data)
@@ -654,36 +786,41 @@ if not observer.is_alive():
 @app.route('/api/search-orginfo', methods=['GET'])
 def api_search_orginfo():
     company_name = request.args.get("company_name")
-    org_url = search_orginfo(company_name)
-    if org_url:
-        company_details = fetch_company_details_orginfo(org_url)
-        return jsonify(company_details)
+    try:
+        org_url = search_orginfo(company_name)
+        if org_url:
+            company_details = fetch_company_details_orginfo(org_url)
+            return jsonify(company_details)
+    except SourceUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     return jsonify({"error": "No match found"})
 
 @app.route('/api/search-egrul', methods=['GET'])
 def api_search_egrul():
     inn = request.args.get("inn")
-    company_details = get_company_details(inn)
+    try:
+        company_details = get_company_details(inn)
+    except SourceUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     if company_details:
         return jsonify(company_details)
     return jsonify({"error": "No match found"})
 
-# API endpoint to get parsed files
+# API endpoint to get parsed files, accepting the same filters as /api/export-messages
 @app.route('/api/parsed-swift-files', methods=['GET'])
 def get_parsed_files():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM swift_messages")
-    rows = cursor.fetchall()
-    conn.close()
-
-    parsed_files = []
-    for row in rows:
-        row_dict = dict(row)
-        parsed_files.append(row_dict)
+    message_store = get_message_store()
+    # Taken before the read, so following the feed from here cannot miss a change
+    change_seq = message_store.change_bounds()[1] or 0
+    try:
+        parsed_files = message_store.list_messages(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filter value: {e}"}), 400
 
-    return jsonify(parsed_files)
+    response = jsonify(parsed_files)
+    response.headers["X-Change-Seq"] = str(change_seq)
+    response.headers["X-Archived-Partitions"] = ",".join(message_store.archived_months(request.args))
+    return response
 
 # API endpoint to process SWIFT messages from POST data
 @app.route('/api/process-swift', methods=['POST'])
@@ -706,39 +843,155 @@ def process_swift():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/api/retry-enrichment', methods=['POST'])
+def api_retry_enrichment():
+    limit = request.args.get("limit", 50, type=int)
+    result = retry_pending_enrichment(limit)
+    result["circuits"] = http_client.circuit_status()
+    return jsonify(result)
+
+def run_swift_job(parsed_data, report):
+    """Background part of an asynchronous /api/process-swift job; the result carries the stored id, if it was stored."""
+    enrich_parsed_data(parsed_data, report)
+    report("saving")
+    # A database error fails the job instead of reporting an unsaved message as done
+    store_parsed_message(parsed_data)
+    return parsed_data
+
+# API endpoint to process SWIFT messages as background jobs.
+# Accepts {"message": "..."} or {"messages": [...]} and answers as soon as parsing is done.
+@app.route('/api/process-swift/jobs', methods=['POST'])
+def submit_swift_jobs():
+    data = request.json or {}
+    if 'messages' in data:
+        messages = data['messages']
+        if not isinstance(messages, list) or not messages:
+            return jsonify({"error": "messages must be a non-empty list of SWIFT messages."}), 400
+    else:
+        messages = [data.get('message', '')]
+
+    jobs = []
+    for message in messages:
+        if not isinstance(message, str) or not message.strip():
+            jobs.append({"error": "The SWIFT message cannot be empty."})
+            continue
+        parsed_data = parse_mt103_data(message)
+        if not parsed_data.get('transaction_reference'):
+            jobs.append({"error": "Failed to extract required information"})
+            continue
+        job_id = swift_jobs.submit(run_swift_job, parsed_data)
+        jobs.append({"job_id": job_id, "transaction_reference": parsed_data['transaction_reference']})
+
+    if 'messages' not in data:
+        job = jobs[0]
+        return jsonify(job), (400 if "error" in job else 202)
+    return jsonify(jobs), 202
+
+# Status of several jobs at once, for clients following a batch by polling
+@app.route('/api/process-swift/jobs', methods=['GET'])
+def get_swift_jobs():
+    job_ids = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+    return jsonify([swift_jobs.get(job_id) or {"job_id": job_id, "status": "failed", "error": "No job found with the given ID"}
+                    for job_id in job_ids])
+
+# One event stream for a whole batch, so a large upload holds a single connection and server thread
+@app.route('/api/process-swift/jobs/events', methods=['GET'])
+def stream_swift_jobs():
+    job_ids = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+    if not job_ids:
+        return jsonify({"error": "No job IDs given"}), 400
+    return Response(
+        swift_jobs.stream(*job_ids),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/process-swift/jobs/<string:job_id>', methods=['GET'])
+def get_swift_job(job_id):
+    job = swift_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "No job found with the given ID"}), 404
+    return jsonify(job)
+
+@app.route('/api/process-swift/jobs/<string:job_id>/events', methods=['GET'])
+def stream_swift_job(job_id):
+    if swift_jobs.get(job_id) is None:
+        return jsonify({"error": "No job found with the given ID"}), 404
+    return Response(
+        swift_jobs.stream(job_id),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def replay_into_database(batch):
+    """Bulk-insert a batch of logged messages; returns how many were new."""
+    pending = {data.get("transaction_reference"): data.get("pending_enrichment", []) for data in batch}
+    # Already stored references are skipped by the store
+    inserted = get_message_store().bulk_insert((message_values(data) for data in batch), pending)
+    by_reference = {data.get("transaction_reference"): data for data in batch}
+    score_saved_messages([(message_id, by_reference[reference]) for message_id, reference in inserted])
+    return len(inserted)
+
+def replay_parsed_log(target, from_seq, report):
+    """Rebuild the database or the parsed_files cache from the segment log."""
+    replayed, inserted, batch = 0, 0, []
+    for entry in read_parsed_log().replay(from_seq):
+        if target == "database":
+            batch.append(entry["data"])
+            if len(batch) >= REPLAY_BATCH_SIZE:
+                inserted += replay_into_database(batch)
+                batch = []
+        else:
+            parsed_files[entry["source"] or entry["data"].get("transaction_reference")] = entry["data"]
+        replayed += 1
+        if replayed % 1000 == 0:
+            report("replaying", replayed=replayed, seq=entry["seq"])
+    if batch:
+        inserted += replay_into_database(batch)
+    result = {"target": target, "replayed": replayed}
+    if target == "database":
+        result["inserted"] = inserted
+    return result
+
+@app.route('/api/parsed-log/replay', methods=['POST'])
+def submit_parsed_log_replay():
+    target = request.args.get("target", "database")
+    if target not in ("database", "cache"):
+        return jsonify({"error": f"Unknown replay target: {target}"}), 400
+    job_id = swift_jobs.submit(replay_parsed_log, target, request.args.get("fromSeq", 1, type=int))
+    return jsonify({"job_id": job_id}), 202
+
+@app.route('/api/parsed-log', methods=['GET'])
+def parsed_log_stats():
+    return jsonify(read_parsed_log().stats())
+
 @app.route('/api/update-status/<string:id>', methods=['PATCH'])
 def update_status(id):
     new_status = request.json.get('status')
     if not new_status:
         return jsonify({"error": "Missing status"}), 400
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        'UPDATE swift_messages SET status = ? WHERE id = ?', (new_status, id)
-    )
-    conn.commit()
+    updated = get_message_store().update_messages({"status": new_status}, message_id=id)
 
-    if cursor.rowcount > 0:
-        conn.close()
+    if updated > 0:
         return jsonify({"message": "Status updated successfully"}), 200
     else:
-        conn.close()
         return jsonify({"error": "No message found with the given ID"}), 404
 
 # Delete Message Endpoint
 @app.route('/api/delete-message/<string:id>', methods=['DELETE'])
 def delete_message(id):
+    deleted = get_message_store().delete_message(id)
+
+    # Scores and flags of the message are kept in the local SQLite file
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
-
-    # Execute the delete command
-    cursor.execute('DELETE FROM swift_messages WHERE id = ?', (id,))
+    cursor.execute("DELETE FROM risk_scores WHERE message_id = ?", (id,))
+    cursor.execute("DELETE FROM payment_flags WHERE message_id = ?", (id,))
     conn.commit()
     
     # Check if the deletion was successful
-    if cursor.rowcount > 0:
+    if deleted > 0:
         conn.close()
         return jsonify({"message": f"Message with reference {id} deleted successfully"}), 200
     else:
@@ -746,6 +999,7 @@ def delete_message(id):
         return jsonify({"error": f"No message found with reference {id}"}), 404
 
 if __name__ == '__main__':
+    initialize_db()
     try:
         app.run(port=3001, debug=True)
     except KeyboardInterrupt: